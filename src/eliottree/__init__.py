@@ -1,17 +1,26 @@
-from eliottree._errors import EliotParseError, JSONParseError
-from eliottree._parse import tasks_from_iterable
+from eliottree._errors import (
+    EliotParseError, FilterExpressionError, JSONParseError)
+from eliottree._parse import group_tasks_by_shape, tasks_from_iterable
 from eliottree._render import render_tasks
 from eliottree.filter import (
     filter_by_end_date, filter_by_jmespath, filter_by_start_date,
-    filter_by_uuid, combine_filters_and)
+    filter_by_uuid, filter_by_uuids, filter_by_field_regex,
+    filter_by_date_range, filter_batches,
+    filter_tasks_by_duration, filter_tasks_failed, filter_tasks_by_expression,
+    combine_filters_and, combine_task_filters_and)
 from eliottree._theme import get_theme, apply_theme_overrides, Theme
 from eliottree._color import color_factory, colored
 
 
 __all__ = [
-    'filter_by_jmespath', 'filter_by_uuid', 'filter_by_start_date',
-    'filter_by_end_date', 'render_tasks', 'tasks_from_iterable',
-    'EliotParseError', 'JSONParseError', 'combine_filters_and',
+    'filter_by_jmespath', 'filter_by_uuid', 'filter_by_uuids',
+    'filter_by_field_regex', 'filter_by_start_date', 'filter_by_end_date',
+    'filter_by_date_range', 'filter_batches',
+    'filter_tasks_by_duration', 'filter_tasks_failed',
+    'filter_tasks_by_expression', 'render_tasks', 'tasks_from_iterable',
+    'group_tasks_by_shape',
+    'EliotParseError', 'JSONParseError', 'FilterExpressionError',
+    'combine_filters_and', 'combine_task_filters_and',
     'get_theme', 'apply_theme_overrides', 'Theme', 'color_factory',
     'colored',
 ]
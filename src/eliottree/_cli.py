@@ -3,19 +3,27 @@ import codecs
 import json
 import os
 import platform
+import re
 import sys
 from pprint import pformat
 
 import iso8601
-from six import PY3, binary_type, reraise
+from six import PY3, binary_type, reraise, text_type
 from six.moves import filter
 
 from eliottree import (
-    EliotParseError, JSONParseError, filter_by_end_date, filter_by_jmespath,
-    filter_by_start_date, filter_by_uuid, render_tasks, tasks_from_iterable,
-    combine_filters_and)
+    EliotParseError, FilterExpressionError, JSONParseError,
+    filter_batches, filter_by_date_range, filter_by_field_regex,
+    filter_by_jmespath, filter_by_uuid, filter_by_uuids,
+    filter_tasks_by_duration, filter_tasks_by_expression, filter_tasks_failed,
+    group_tasks_by_shape, render_tasks, tasks_from_iterable,
+    combine_filters_and, combine_task_filters_and)
 from eliottree._color import colored
+from eliottree._index import (
+    DEFAULT_REGION_SIZE, INDEXED_FIELDS, build_index, indexed_lines,
+    read_index)
 from eliottree._theme import get_theme, apply_theme_overrides
+from eliottree.filter import _jmespath_field_values
 
 
 def text_writer(fd):
@@ -36,27 +44,103 @@ def text_reader(fd):
     return codecs.getreader('utf-8')(fd)
 
 
+def index_constraints(select=None, task_uuid=None):
+    """
+    Determine the values that indexed fields must have for a message to be
+    selected by the provided criteria.
+
+    :rtype: ``Dict[text_type, Set[text_type]]``
+    """
+    constraints = {}
+
+    def _constrain(field, values):
+        if values is not None:
+            constraints[field] = constraints.get(field, values) & values
+
+    if isinstance(task_uuid, list):
+        _constrain(u'task_uuid', set(task_uuid))
+    elif task_uuid is not None:
+        _constrain(u'task_uuid', {task_uuid})
+    for query in select or []:
+        for field in INDEXED_FIELDS:
+            _constrain(field, _jmespath_field_values(query, field))
+    return constraints
+
+
 def parse_messages(files=None, select=None, task_uuid=None, start=None,
-                   end=None):
+                   end=None, use_index=True, min_duration=None,
+                   max_duration=None, failed_only=False, expressions=None,
+                   match=None, batch_size=None, task_shapes=None):
     """
     Parse message dictionaries from inputs into Eliot tasks, filtering by any
     provided criteria.
+
+    If a file has an up-to-date index, built by `build_index`, regions of the
+    file that cannot contain selected messages are skipped without being
+    decoded.
+
+    :type task_uuid: ``text_type`` or ``List[text_type]``
+    :param task_uuid: Task UUID, or UUIDs, to select; an empty list selects
+    no tasks.
+    :param bool use_index: Consult file indexes?
+    :param float min_duration: Minimum root action duration, in seconds, of
+    tasks to select.
+    :param float max_duration: Maximum root action duration, in seconds, of
+    tasks to select.
+    :param bool failed_only: Select only tasks containing a failed action?
+    :type expressions: ``List[text_type]``
+    :param expressions: Filter expressions, see `filter_tasks_by_expression`,
+    that selected tasks must all satisfy.
+    :type match: ``List[Tuple[text_type, text_type]]``
+    :param match: Field names and regular expressions their values must
+    match.
+    :param int batch_size: Evaluate message filters over batches of this many
+    messages, see `filter_batches`, or ``None`` to evaluate them one message
+    at a time.
+    :type task_shapes: ``Dict[text_type, int]``
+    :param task_shapes: Mapping to record the shape of each task in, see
+    `tasks_from_iterable`.
     """
     def filter_funcs():
-        if task_uuid is not None:
+        if isinstance(task_uuid, list):
+            yield filter_by_uuids(task_uuid)
+        elif task_uuid is not None:
             yield filter_by_uuid(task_uuid)
-        if start:
-            yield filter_by_start_date(start)
-        if end:
-            yield filter_by_end_date(end)
+        if start or end:
+            yield filter_by_date_range(start or None, end or None)
         if select is not None:
             for query in select:
                 yield filter_by_jmespath(query)
+        for field, pattern in match or []:
+            yield filter_by_field_regex(field, pattern)
+
+    def task_filter_funcs():
+        if min_duration is not None or max_duration is not None:
+            yield filter_tasks_by_duration(min_duration, max_duration)
+        if failed_only:
+            yield filter_tasks_failed()
+        for expression in expressions or []:
+            yield filter_tasks_by_expression(expression)
+
+    def _line_matches(line):
+        for line_filter in line_filters:
+            if not line_filter(line):
+                return False
+        return True
+
+    def _lines(file, file_name):
+        if constraints and os.path.isfile(file_name):
+            index = read_index(file_name)
+            if index is not None:
+                return indexed_lines(file_name, index, constraints)
+        return enumerate(file, 1)
 
     def _parse(files, inventory):
         for file in files:
             file_name = getattr(file, 'name', '<unknown>')
-            for line_number, line in enumerate(file, 1):
+            for line_number, line in _lines(file, file_name):
+                if line_filters and not _line_matches(line):
+                    continue
                 try:
                     task = json.loads(line)
                     inventory[id(task)] = file_name, line_number
@@ -70,9 +154,24 @@ def parse_messages(files=None, select=None, task_uuid=None, start=None,
 
     if not files:
         files = [text_reader(sys.stdin)]
+    constraints = (
+        index_constraints(select=select, task_uuid=task_uuid)
+        if use_index else {})
+    task_filters = list(task_filter_funcs())
+    task_filter = None
+    if task_filters:
+        task_filter = combine_task_filters_and(*task_filters)
+    filters = list(filter_funcs())
+    line_filters = [
+        f.line_filter for f in filters if hasattr(f, 'line_filter')]
     inventory = {}
+    messages = _parse(files, inventory)
+    if batch_size:
+        messages = filter_batches(filters, messages, batch_size)
+    else:
+        messages = filter(combine_filters_and(*filters), messages)
     return inventory, tasks_from_iterable(
-        filter(combine_filters_and(*filter_funcs()), _parse(files, inventory)))
+        messages, task_filter=task_filter, task_shapes=task_shapes)
 
 
 def setup_platform(colorize):
@@ -90,7 +189,9 @@ def setup_platform(colorize):
 
 
 def display_tasks(tasks, color, colorize_tree, ascii, theme_name, ignored_fields,
-                  field_limit, human_readable, utc_timestamps, theme_overrides):
+                  field_limit, human_readable, utc_timestamps, theme_overrides,
+                  max_items=None, max_nesting=None, max_depth=None,
+                  max_children=None, collapse_repeated=False):
     """
     Render Eliot tasks, apply any command-line-specified behaviour and render
     the task trees to stdout.
@@ -123,7 +224,12 @@ def display_tasks(tasks, color, colorize_tree, ascii, theme_name, ignored_fields
         colorize_tree=colorize and colorize_tree,
         ascii=ascii,
         utc_timestamps=utc_timestamps,
-        theme=theme)
+        theme=theme,
+        max_items=max_items,
+        max_nesting=max_nesting,
+        max_depth=max_depth,
+        max_children=max_children,
+        collapse_repeated=collapse_repeated)
 
 
 def _decode_command_line(value, encoding='utf-8'):
@@ -135,6 +241,47 @@ def _decode_command_line(value, encoding='utf-8'):
     return value
 
 
+def _field_regex(value):
+    """
+    Parse a ``FIELD=REGEX`` command-line argument.
+    """
+    value = _decode_command_line(value)
+    field, sep, pattern = value.partition(u'=')
+    if not field or not sep:
+        raise argparse.ArgumentTypeError(
+            'Expected FIELD=REGEX: {!r}'.format(value))
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(
+            'Invalid regular expression {!r}: {}'.format(pattern, e))
+    return field, pattern
+
+
+def _positive_int(value):
+    """
+    Parse a positive integer command-line argument.
+    """
+    try:
+        result = int(value)
+    except ValueError:
+        result = 0
+    if result < 1:
+        raise argparse.ArgumentTypeError(
+            'Expected a positive integer: {!r}'.format(value))
+    return result
+
+
+def read_task_uuids(fd):
+    """
+    Read task UUIDs, one per line, from a file. Blank lines are ignored.
+    """
+    for line in fd:
+        line = _decode_command_line(line).strip()
+        if line:
+            yield line
+
+
 def is_dark_terminal_background(default=True):
     """
     Does the terminal use a dark background color?
@@ -182,7 +329,8 @@ def read_config(path):
 
 CONFIG_BLACKLIST = [
     'files', 'start', 'end', 'print_default_config', 'config', 'select',
-    'task_uuid']
+    'task_uuid', 'task_uuid_file', 'build_index', 'min_duration',
+    'max_duration', 'failed_only', 'expressions', 'match']
 
 
 def print_namespace(namespace):
@@ -208,10 +356,19 @@ def main():
                         dest='config',
                         help='''File to read configuration options from.''')
     parser.add_argument('-u', '--task-uuid',
+                        action='append',
                         dest='task_uuid',
                         metavar='UUID',
                         type=_decode_command_line,
-                        help='''Select a specific task by UUID.''')
+                        help='''Select a specific task by UUID, can be
+                        specified multiple times to select several tasks.''')
+    parser.add_argument('--task-uuid-file',
+                        action='append',
+                        dest='task_uuid_file',
+                        metavar='FILE',
+                        type=argparse.FileType('r'),
+                        help='''Select tasks by UUIDs read from FILE, one per
+                        line, can be specified multiple times.''')
     parser.add_argument('-i', '--ignore-task-key',
                         action='append',
                         default=[],
@@ -259,6 +416,48 @@ def main():
                         help='''Limit the length of field values to LENGTH or a
                         newline, whichever comes first. Use a length of 0 to
                         output the complete value.''')
+    parser.add_argument('--max-items',
+                        metavar='COUNT',
+                        type=_positive_int,
+                        dest='max_items',
+                        help='''Render at most COUNT items of nested dict and
+                        list field values, summarizing the remainder.''')
+    parser.add_argument('--max-nesting',
+                        metavar='LEVELS',
+                        type=_positive_int,
+                        dest='max_nesting',
+                        help='''Render dict and list field values at most
+                        LEVELS levels deep, summarizing deeper values. A
+                        message's own fields are the first level.''')
+    parser.add_argument('--max-depth',
+                        metavar='LEVELS',
+                        type=_positive_int,
+                        dest='max_depth',
+                        help='''Render the actions and messages of a task at
+                        most LEVELS levels deep, summarizing deeper ones with
+                        their counts, failures and total duration. The root
+                        action is the first level.''')
+    parser.add_argument('--max-children',
+                        metavar='COUNT',
+                        type=_positive_int,
+                        dest='max_children',
+                        help='''Render at most COUNT child actions and
+                        messages of each action, summarizing the remainder
+                        with their counts, failures and total duration.''')
+    parser.add_argument('--collapse-repeated',
+                        dest='collapse_repeated',
+                        action='store_true',
+                        help='''Collapse consecutive sibling actions with the
+                        same action type and status into a single node,
+                        showing their count and minimum, average and maximum
+                        durations.''')
+    parser.add_argument('--group-shapes',
+                        dest='group_shapes',
+                        action='store_true',
+                        help='''Render only the first task of each shape, its
+                        action and message types, nesting and statuses,
+                        showing how many tasks had that shape and their
+                        minimum, average and maximum durations.''')
     parser.add_argument('--select',
                         action='append',
                         metavar='QUERY',
@@ -267,6 +466,16 @@ def main():
                         help='''Select tasks to be displayed based on a jmespath
                         query, can be specified multiple times to mimic logical
                         AND. See <http://jmespath.org/>''')
+    parser.add_argument('--match',
+                        action='append',
+                        metavar='FIELD=REGEX',
+                        dest='match',
+                        type=_field_regex,
+                        help='''Select tasks whose FIELD text value matches a
+                        regular expression, can be specified multiple times
+                        to mimic logical AND. Nested fields can be named with
+                        ".", such as "request.uri". Lines that cannot match
+                        are skipped without being decoded.''')
     parser.add_argument('--start',
                         dest='start',
                         type=iso8601.parse_date,
@@ -277,6 +486,63 @@ def main():
                         type=iso8601.parse_date,
                         help='''Select tasks whose timestamp occurs before an
                         ISO8601 date.''')
+    parser.add_argument('--min-duration',
+                        dest='min_duration',
+                        metavar='SECONDS',
+                        type=float,
+                        help='''Select tasks whose root action took at least
+                        SECONDS to complete.''')
+    parser.add_argument('--max-duration',
+                        dest='max_duration',
+                        metavar='SECONDS',
+                        type=float,
+                        help='''Select tasks whose root action took at most
+                        SECONDS to complete.''')
+    parser.add_argument('--failed-only',
+                        dest='failed_only',
+                        action='store_true',
+                        help='''Select only tasks containing a failed
+                        action.''')
+    parser.add_argument('--filter',
+                        action='append',
+                        metavar='EXPRESSION',
+                        dest='expressions',
+                        type=_decode_command_line,
+                        help='''Select tasks satisfying a filter expression,
+                        combining predicates with "and", "or", "not" and
+                        parentheses. Predicates are "uuid:UUID",
+                        "status:STATUS", "start:DATE", "end:DATE",
+                        "duration<SECONDS" (or <=, >, >=) and
+                        "select:QUERY". Can be specified multiple times to
+                        mimic logical AND.''')
+    parser.add_argument('--batch-size',
+                        metavar='MESSAGES',
+                        type=_positive_int,
+                        dest='batch_size',
+                        help='''Evaluate selection criteria over batches of
+                        MESSAGES messages at a time, which is faster when
+                        combining several criteria or selecting few messages
+                        by task UUID, but delays output until each batch has
+                        been read.''')
+    parser.add_argument('--no-index',
+                        action='store_false',
+                        dest='use_index',
+                        help='''Do not consult file indexes when selecting
+                        tasks.''')
+    parser.add_argument('--build-index',
+                        dest='build_index',
+                        action='store_true',
+                        help='''Build an index alongside each FILE, summarizing
+                        the task UUIDs and action types in each region of the
+                        file, so that regions that cannot match a selection are
+                        skipped.''')
+    parser.add_argument('--index-region-size',
+                        metavar='BYTES',
+                        type=_positive_int,
+                        default=DEFAULT_REGION_SIZE,
+                        dest='index_region_size',
+                        help='''Size of the file regions summarized by
+                        --build-index.''')
     parser.add_argument('--show-default-config',
                         dest='print_default_config',
                         action='store_true',
@@ -297,14 +563,41 @@ def main():
         print_namespace(args)
         return
 
+    if args.build_index:
+        stdout = text_writer(sys.stdout)
+        for fd in args.files:
+            fd.close()
+            stdout.write(u'{}\n'.format(
+                build_index(fd.name, region_size=args.index_region_size)))
+        return
+
+    # A UUID file without any UUIDs selects no tasks, rather than all of them.
+    task_uuids = None
+    if args.task_uuid or args.task_uuid_file:
+        task_uuids = list(args.task_uuid or [])
+    for fd in args.task_uuid_file or []:
+        with fd:
+            task_uuids.extend(read_task_uuids(fd))
+
     stderr = text_writer(sys.stderr)
+    task_shapes = {} if args.group_shapes else None
     try:
         inventory, tasks = parse_messages(
             files=args.files,
             select=args.select,
-            task_uuid=args.task_uuid,
+            task_uuid=task_uuids,
             start=args.start,
-            end=args.end)
+            end=args.end,
+            use_index=args.use_index,
+            min_duration=args.min_duration,
+            max_duration=args.max_duration,
+            failed_only=args.failed_only,
+            expressions=args.expressions,
+            match=args.match,
+            batch_size=args.batch_size,
+            task_shapes=task_shapes)
+        if task_shapes is not None:
+            tasks = group_tasks_by_shape(tasks, task_shapes)
         display_tasks(
             tasks=tasks,
             color=args.color,
@@ -315,7 +608,14 @@ def main():
             field_limit=args.field_limit,
             human_readable=args.human_readable,
             utc_timestamps=args.utc_timestamps,
-            theme_overrides=config.get('theme_overrides'))
+            theme_overrides=config.get('theme_overrides'),
+            max_items=args.max_items,
+            max_nesting=args.max_nesting,
+            max_depth=args.max_depth,
+            max_children=args.max_children,
+            collapse_repeated=args.collapse_repeated)
+    except FilterExpressionError as e:
+        parser.error(text_type(e))
     except JSONParseError as e:
         stderr.write(u'JSON parse error, file {}, line {}:\n{}\n\n'.format(
             e.file_name,
@@ -1,4 +1,5 @@
 import colored as _colored
+from six import text_type
 
 
 # Disable `colored` TTY awareness, since we handle this ourselves.
@@ -37,12 +38,36 @@ def colored(text, fg=None, bg=None, attrs=None):
         _colored.attr(0))
 
 
+# Text used to discover the escape sequences a colorizer wraps text in.
+_PLACEHOLDER = u'\x00'
+
+
+def _identity(text):
+    return text
+
+
 def color_factory(colored):
     """
     Factory for making text color-wrappers.
+
+    The prefix and suffix that ``colored`` wraps text in are determined once
+    for each color, so that coloring text is only string concatenation. If
+    ``colored`` does more than wrap text then it is called for every text.
     """
     def _color(fg, bg=None, attrs=[]):
         def __color(text):
             return colored(text, fg, bg, attrs=attrs)
-        return __color
+
+        prefix, sep, suffix = colored(
+            _PLACEHOLDER, fg, bg, attrs=attrs).partition(_PLACEHOLDER)
+        if not sep or _PLACEHOLDER in suffix:
+            return __color
+        elif not prefix and not suffix:
+            return _identity
+
+        def _wrap(text):
+            if not isinstance(text, text_type):
+                text = text_type(text)
+            return prefix + text + suffix
+        return _wrap
     return _color
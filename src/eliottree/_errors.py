@@ -19,4 +19,18 @@ class JSONParseError(RuntimeError):
         self.exc_info = exc_info
 
 
-__all__ = ['EliotParseError', 'JSONParseError']
+class FilterExpressionError(ValueError):
+    """
+    A filter expression is invalid.
+    """
+    def __init__(self, expression, reason):
+        self.expression = expression
+        self.reason = reason
+        ValueError.__init__(self, expression, reason)
+
+    def __str__(self):
+        return u'Invalid filter expression {!r}: {}'.format(
+            self.expression, self.reason)
+
+
+__all__ = ['EliotParseError', 'JSONParseError', 'FilterExpressionError']
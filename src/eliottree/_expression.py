@@ -0,0 +1,141 @@
+import re
+
+from eliottree._errors import FilterExpressionError
+
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<paren>[()])
+      | (?P<name>[A-Za-z_]+)\s*(?P<op>>=|<=|!=|=|:|<|>)\s*
+        (?P<value>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[^\s()]+)
+      | (?P<keyword>[A-Za-z]+)(?![^\s()])
+    )''', re.VERBOSE)
+
+_ESCAPE = re.compile(r'\\(.)')
+
+_KEYWORDS = (u'and', u'or', u'not')
+
+
+def _unquote(value):
+    """
+    Remove the quotes, and unescape the contents, of a quoted value.
+    """
+    if value[:1] in (u'"', u"'"):
+        return _ESCAPE.sub(r'\1', value[1:-1])
+    return value
+
+
+def _describe(token):
+    """
+    Describe a token for an error message.
+    """
+    return u''.join(token[1:])
+
+
+def tokenize(expression):
+    """
+    Split a filter expression into tokens.
+
+    :rtype: ``List[Tuple]``
+    :return: ``(u'paren', text)``, ``(u'keyword', text)`` or
+    ``(u'predicate', name, op, value)`` tuples.
+    """
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if match is None:
+            raise FilterExpressionError(
+                expression,
+                u'Unexpected input at position {}'.format(pos))
+        if match.group('paren'):
+            tokens.append((u'paren', match.group('paren')))
+        elif match.group('name'):
+            tokens.append((
+                u'predicate',
+                match.group('name').lower(),
+                match.group('op'),
+                _unquote(match.group('value'))))
+        else:
+            keyword = match.group('keyword').lower()
+            if keyword not in _KEYWORDS:
+                raise FilterExpressionError(
+                    expression,
+                    u'Unknown keyword {!r}'.format(match.group('keyword')))
+            tokens.append((u'keyword', keyword))
+        pos = match.end()
+    return tokens
+
+
+def parse(expression):
+    """
+    Parse a filter expression into a syntax tree.
+
+    The grammar is::
+
+        expr      := and_expr ("or" and_expr)*
+        and_expr  := not_expr ("and" not_expr)*
+        not_expr  := "not" not_expr | "(" expr ")" | predicate
+        predicate := NAME OP VALUE
+
+    where ``OP`` is one of ``:``, ``=``, ``!=``, ``<``, ``<=``, ``>`` or
+    ``>=`` and ``VALUE`` may be quoted with ``'`` or ``"``.
+
+    :return: Nested, hashable tuples of ``(u'or', children)``,
+    ``(u'and', children)``, ``(u'not', child)`` and
+    ``(u'predicate', name, op, value)``.
+    """
+    tokens = tokenize(expression)
+    pos = [0]
+
+    def _peek():
+        if pos[0] < len(tokens):
+            return tokens[pos[0]]
+        return None
+
+    def _next():
+        token = _peek()
+        if token is None:
+            raise FilterExpressionError(
+                expression, u'Unexpected end of expression')
+        pos[0] += 1
+        return token
+
+    def _binary(op, operand):
+        children = [operand()]
+        while _peek() == (u'keyword', op):
+            _next()
+            children.append(operand())
+        if len(children) == 1:
+            return children[0]
+        return (op, tuple(children))
+
+    def _expr():
+        return _binary(u'or', _and_expr)
+
+    def _and_expr():
+        return _binary(u'and', _not_expr)
+
+    def _not_expr():
+        token = _next()
+        if token == (u'keyword', u'not'):
+            return (u'not', _not_expr())
+        elif token == (u'paren', u'('):
+            result = _expr()
+            if _next() != (u'paren', u')'):
+                raise FilterExpressionError(expression, u'Expected ")"')
+            return result
+        elif token[0] == u'predicate':
+            return token
+        raise FilterExpressionError(
+            expression, u'Unexpected {!r}'.format(_describe(token)))
+
+    result = _expr()
+    if _peek() is not None:
+        raise FilterExpressionError(
+            expression, u'Unexpected {!r}'.format(_describe(_peek())))
+    return result
+
+
+__all__ = ['parse', 'tokenize']
@@ -0,0 +1,223 @@
+import base64
+import hashlib
+import json
+import math
+import os
+import struct
+
+from six import text_type
+
+
+#: Default size, in bytes, of an indexed log region.
+DEFAULT_REGION_SIZE = 4 * 1024 * 1024
+
+#: Fields whose values are recorded in a log index.
+INDEXED_FIELDS = (u'task_uuid', u'action_type')
+
+_INDEX_VERSION = 1
+_INDEX_SUFFIX = '.eliottree-index'
+
+
+class BloomFilter(object):
+    """
+    A probabilistic set membership test, which can produce false positives but
+    never false negatives.
+    """
+    def __init__(self, bits, hashes, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        if data is None:
+            data = bytearray((bits + 7) // 8)
+        self.data = data
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.01):
+        """
+        Create a `BloomFilter` sized to hold ``capacity`` items with a false
+        positive rate of approximately ``error_rate``.
+        """
+        capacity = max(capacity, 1)
+        # Very small filters degrade badly with double hashing.
+        bits = max(64, int(math.ceil(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        hashes = max(1, int(round(bits / capacity * math.log(2))))
+        return cls(bits, hashes)
+
+    def _positions(self, item):
+        h1, h2 = struct.unpack(
+            '<QQ',
+            hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest())
+        h2 |= 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, item):
+        """
+        Add a ``text_type`` item.
+        """
+        data = self.data
+        for pos in self._positions(item):
+            data[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        data = self.data
+        return all(
+            data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def to_json(self):
+        return {
+            u'bits': self.bits,
+            u'hashes': self.hashes,
+            u'data': base64.b64encode(bytes(self.data)).decode('ascii')}
+
+    @classmethod
+    def from_json(cls, obj):
+        return cls(
+            obj[u'bits'],
+            obj[u'hashes'],
+            bytearray(base64.b64decode(obj[u'data'])))
+
+
+def _item(field, value):
+    """
+    Bloom filter item for a field value.
+    """
+    return u'{}\x00{}'.format(field, value)
+
+
+def index_path(path):
+    """
+    Path of the index for the log file at ``path``.
+    """
+    return path + _INDEX_SUFFIX
+
+
+def _file_stamp(path):
+    """
+    Size and modification time of a file, used to detect stale indexes.
+    """
+    st = os.stat(path)
+    return st.st_size, st.st_mtime
+
+
+def _region_summary(offset, length, line_number, values):
+    """
+    Summarize a region of a log file; ``values`` of ``None`` indicates the
+    region could not be summarized and must always be read.
+    """
+    bloom = None
+    if values is not None:
+        bloom = BloomFilter.for_capacity(len(values))
+        for value in values:
+            bloom.add(value)
+        bloom = bloom.to_json()
+    return {
+        u'offset': offset,
+        u'length': length,
+        u'line': line_number,
+        u'bloom': bloom}
+
+
+def build_index(path, region_size=DEFAULT_REGION_SIZE):
+    """
+    Build and write an index for the log file at ``path``, summarizing the
+    indexed field values of each region of roughly ``region_size`` bytes.
+
+    :return: Path of the written index.
+    """
+    size, mtime = _file_stamp(path)
+    regions = []
+    with open(path, 'rb') as fd:
+        offset = 0
+        start = 0
+        start_line = 1
+        values = set()
+        line_number = 0
+        for line_number, line in enumerate(fd, 1):
+            offset += len(line)
+            if values is not None:
+                try:
+                    message = json.loads(line)
+                    for field in INDEXED_FIELDS:
+                        value = message.get(field)
+                        if isinstance(value, text_type):
+                            values.add(_item(field, value))
+                except Exception:
+                    # Leave malformed regions to the parser to report.
+                    values = None
+            if offset - start >= region_size:
+                regions.append(_region_summary(
+                    start, offset - start, start_line, values))
+                start = offset
+                start_line = line_number + 1
+                values = set()
+        if offset > start:
+            regions.append(_region_summary(
+                start, offset - start, start_line, values))
+    index = {
+        u'version': _INDEX_VERSION,
+        u'size': size,
+        u'mtime': mtime,
+        u'regions': regions}
+    result = index_path(path)
+    with open(result, 'w') as fd:
+        json.dump(index, fd)
+    return result
+
+
+def read_index(path):
+    """
+    Read the index for the log file at ``path``.
+
+    :return: The index, or ``None`` if there is no index or it is out of date.
+    """
+    try:
+        with open(index_path(path), 'rb') as fd:
+            index = json.loads(fd.read().decode('utf-8'))
+        if index.get(u'version') != _INDEX_VERSION:
+            return None
+        if (index[u'size'], index[u'mtime']) != _file_stamp(path):
+            return None
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+    return index
+
+
+def _region_matches(bloom, constraints):
+    """
+    Can a region summarized by ``bloom`` contain messages matching
+    ``constraints``?
+    """
+    if bloom is None:
+        return True
+    bloom = BloomFilter.from_json(bloom)
+    for field, values in constraints.items():
+        if not any(_item(field, value) in bloom for value in values):
+            return False
+    return True
+
+
+def indexed_lines(path, index, constraints, encoding='utf-8'):
+    """
+    Read lines from the log file at ``path`` that may match ``constraints``,
+    skipping regions whose index proves they cannot.
+
+    :type constraints: ``Dict[text_type, Set[text_type]]``
+    :param constraints: Mapping of indexed field names to values, a message
+    must have one of the values for each field to match.
+    :rtype: ``Iterable[Tuple[int, text_type]]``
+    :return: Line numbers and lines.
+    """
+    with open(path, 'rb') as fd:
+        for region in index[u'regions']:
+            if not _region_matches(region[u'bloom'], constraints):
+                continue
+            fd.seek(region[u'offset'])
+            data = fd.read(region[u'length'])
+            for line_number, line in enumerate(
+                    data.splitlines(True), region[u'line']):
+                yield line_number, line.decode(encoding)
+
+
+__all__ = [
+    'BloomFilter', 'build_index', 'read_index', 'indexed_lines', 'index_path',
+    'DEFAULT_REGION_SIZE', 'INDEXED_FIELDS']
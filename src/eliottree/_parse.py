@@ -1,30 +1,298 @@
 import sys
+from numbers import Number
 
-from eliot.parse import Parser
+from eliot.parse import Task, WrittenAction
 
 from eliottree._errors import EliotParseError
 
 
-def tasks_from_iterable(iterable):
+class TaskSummary(object):
+    """
+    Incrementally updated summary of the messages in a task, used by task
+    filters to decide whether a task should be kept before it has been fully
+    assembled.
+
+    :type message_predicates: ``Sequence[Callable[[Dict], bool]]``
+    :param message_predicates: Message filters to evaluate against each
+    message added, until satisfied.
+
+    :ivar task_uuid: UUID of the task.
+    :ivar first_timestamp: Earliest message timestamp seen, or ``None``.
+    :ivar last_timestamp: Latest message timestamp seen, or ``None``.
+    :ivar root_start: Timestamp of the root action's start, or ``None``.
+    :ivar root_end: Timestamp of the root action's end, or ``None``.
+    :ivar root_status: Status the root action ended with, or ``None``.
+    :ivar bool failed: Has any action in the task failed?
+    :ivar matched: Set of ``message_predicates`` that at least one message in
+    the task has satisfied.
+    :ivar bool finished: Will no further messages be added to the task?
+    """
+    __slots__ = [
+        'task_uuid', 'first_timestamp', 'last_timestamp', 'root_start',
+        'root_end', 'root_status', 'failed', 'matched', 'finished',
+        '_message_predicates']
+
+    def __init__(self, message_predicates=()):
+        self._message_predicates = message_predicates
+        self.matched = set()
+        self.finished = False
+        self.task_uuid = None
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.root_start = None
+        self.root_end = None
+        self.root_status = None
+        self.failed = False
+
+    @property
+    def duration(self):
+        """
+        Duration of the root action, or ``None`` if it is not yet known.
+        """
+        if self.root_start is None or self.root_end is None:
+            return None
+        return self.root_end - self.root_start
+
+    @property
+    def span(self):
+        """
+        Time between the earliest and latest messages seen, a lower bound on
+        the duration of the root action.
+        """
+        if self.first_timestamp is None:
+            return 0
+        return self.last_timestamp - self.first_timestamp
+
+    def add(self, message_dict):
+        """
+        Update the summary with a serialized Eliot message dictionary.
+        """
+        if self.task_uuid is None:
+            self.task_uuid = message_dict.get(u'task_uuid')
+        for predicate in self._message_predicates:
+            if predicate not in self.matched and predicate(message_dict):
+                self.matched.add(predicate)
+        timestamp = message_dict.get(u'timestamp')
+        if not isinstance(timestamp, Number):
+            timestamp = None
+        if timestamp is not None:
+            if self.first_timestamp is None:
+                self.first_timestamp = self.last_timestamp = timestamp
+            elif timestamp < self.first_timestamp:
+                self.first_timestamp = timestamp
+            elif timestamp > self.last_timestamp:
+                self.last_timestamp = timestamp
+        if u'action_type' not in message_dict:
+            return
+        status = message_dict.get(u'action_status')
+        if status == u'failed':
+            self.failed = True
+        task_level = message_dict.get(u'task_level')
+        if task_level and len(task_level) == 1:
+            if status == u'started':
+                self.root_start = timestamp
+            else:
+                self.root_end = timestamp
+                self.root_status = status
+
+
+def message_shape(message_dict):
+    """
+    Hash the structural parts of a serialized Eliot message dictionary: its
+    task level, action or message type and action status. Timestamps, UUIDs
+    and any other fields are ignored.
+
+    The shape of a task is the sum of the shapes of its messages, which does
+    not depend on the order in which they are seen.
+
+    :rtype: int
+    """
+    key = (
+        message_dict.get(u'task_level'),
+        message_dict.get(u'action_type'),
+        message_dict.get(u'message_type'),
+        message_dict.get(u'action_status'))
+    try:
+        return hash((tuple(key[0] or ()),) + key[1:])
+    except TypeError:
+        return hash(repr(key))
+
+
+class TaskShape(object):
+    """
+    A group of tasks with the same shape, see `group_tasks_by_shape`.
+
+    Durations are summarized as tasks are added, rather than kept, so that
+    the memory used does not grow with the number of tasks.
+
+    :ivar task: The first task seen with this shape, as a representative.
+    :ivar int count: Number of tasks with this shape.
+    :ivar int finished: Number of tasks whose root actions have finished, and
+    so have a duration; tasks with a single message have no duration.
+    :ivar total_duration: Sum of the durations, in seconds.
+    :ivar min_duration: Shortest duration, or ``None`` if none of the tasks
+    has finished.
+    :ivar max_duration: Longest duration, or ``None``.
+    """
+    __slots__ = [
+        'task', 'count', 'finished', 'total_duration', 'min_duration',
+        'max_duration']
+
+    def __init__(self, task):
+        self.task = task
+        self.count = 0
+        self.finished = 0
+        self.total_duration = 0
+        self.min_duration = None
+        self.max_duration = None
+
+    def __repr__(self):
+        return '<TaskShape task_uuid={!r} count={!r}>'.format(
+            self.task.root().task_uuid, self.count)
+
+    def add(self, task):
+        """
+        Count a task with this shape.
+        """
+        self.count += 1
+        root = task.root()
+        if (isinstance(root, WrittenAction)
+                and root.start_message and root.end_message):
+            duration = (
+                root.end_message.timestamp - root.start_message.timestamp)
+            self.finished += 1
+            self.total_duration += duration
+            if self.min_duration is None or duration < self.min_duration:
+                self.min_duration = duration
+            if self.max_duration is None or duration > self.max_duration:
+                self.max_duration = duration
+
+    @property
+    def mean_duration(self):
+        """
+        Mean duration, or ``None`` if none of the tasks has finished.
+        """
+        if not self.finished:
+            return None
+        return self.total_duration / float(self.finished)
+
+
+def group_tasks_by_shape(tasks, task_shapes):
+    """
+    Group tasks with the same shape.
+
+    :type tasks: ``Iterable``
+    :param tasks: Parsed Eliot tasks, from `tasks_from_iterable`.
+    :type task_shapes: ``Dict[text_type, int]``
+    :param task_shapes: The ``task_shapes`` mapping given to
+    `tasks_from_iterable`.
+    :rtype: ``List[TaskShape]``
+    :return: Groups of tasks, in the order their shapes were first seen.
+    """
+    groups = {}
+    result = []
+    for task in tasks:
+        shape = task_shapes.pop(task.root().task_uuid, None)
+        group = groups.get(shape)
+        if group is None:
+            group = groups[shape] = TaskShape(task)
+            result.append(group)
+        group.add(task)
+    return result
+
+
+def _ends_task(message_dict):
+    """
+    Is a serialized Eliot message dictionary the last message of its task,
+    either the end of the root action or a task consisting of a single
+    message?
+    """
+    task_level = message_dict.get(u'task_level')
+    if not task_level or len(task_level) != 1:
+        return False
+    if u'action_type' in message_dict:
+        return message_dict.get(u'action_status') != u'started'
+    return task_level == [1]
+
+
+def tasks_from_iterable(iterable, task_filter=None, task_shapes=None):
     """
     Parse an iterable of Eliot message dictionaries into tasks.
 
     :type iterable: ``Iterable[Dict]``
     :param iterable: Iterable of serialized Eliot message dictionaries.
+    :type task_filter: ``Callable[[TaskSummary], Optional[bool]]``
+    :param task_filter: Predicate deciding whether to keep a task, given a
+    summary of the messages seen so far: ``True`` to keep the task, ``False``
+    to discard it and ignore any further messages until the task ends, or
+    ``None`` if undecided.
+    Tasks still undecided once they are finished are discarded. If the filter
+    has a ``message_predicates`` attribute, they are evaluated by each
+    `TaskSummary`.
+    :type task_shapes: ``Dict[text_type, int]``
+    :param task_shapes: If not ``None``, the shape of each task, see
+    `message_shape`, is computed as its messages are parsed and stored by
+    task UUID just before the task is produced.
     :rtype: ``Iterable``
     :return: Iterable of parsed Eliot tasks, suitable for use with
     `eliottree.render_tasks`.
     """
-    parser = Parser()
+    def _finish(summary):
+        summary.finished = True
+        return task_filter(summary)
+
+    tasks = {}
+    summaries = {}
+    shapes = {}
+    discarded = set()
+    message_predicates = getattr(task_filter, 'message_predicates', ())
     for message_dict in iterable:
         try:
-            completed, parser = parser.add(message_dict)
-            for task in completed:
-                yield task
+            uuid = message_dict[u'task_uuid']
+            if task_filter is not None:
+                if uuid in discarded:
+                    if _ends_task(message_dict):
+                        discarded.discard(uuid)
+                    continue
+                summary = summaries.get(uuid)
+                if summary is None:
+                    summary = summaries[uuid] = TaskSummary(
+                        message_predicates)
+                summary.add(message_dict)
+                if task_filter(summary) is False:
+                    if not _ends_task(message_dict):
+                        discarded.add(uuid)
+                    tasks.pop(uuid, None)
+                    shapes.pop(uuid, None)
+                    del summaries[uuid]
+                    continue
+            if task_shapes is not None:
+                shapes[uuid] = shapes.get(uuid, 0) + message_shape(
+                    message_dict)
+            task = tasks.get(uuid)
+            if task is None:
+                task = Task()
+            task = task.add(message_dict)
+            if task.is_complete():
+                tasks.pop(uuid, None)
+            else:
+                tasks[uuid] = task
+                continue
         except Exception:
             raise EliotParseError(message_dict, sys.exc_info())
-    for task in parser.incomplete_tasks():
-        yield task
+        if task_filter is None or _finish(summaries.pop(uuid)):
+            if task_shapes is not None:
+                task_shapes[uuid] = shapes.pop(uuid)
+            yield task
+        else:
+            shapes.pop(uuid, None)
+    for uuid, task in tasks.items():
+        if task_filter is None or _finish(summaries[uuid]):
+            if task_shapes is not None:
+                task_shapes[uuid] = shapes.pop(uuid)
+            yield task
 
 
-__all__ = ['tasks_from_iterable']
+__all__ = [
+    'tasks_from_iterable', 'TaskSummary', 'TaskShape', 'group_tasks_by_shape',
+    'message_shape']
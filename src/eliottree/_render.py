@@ -1,19 +1,36 @@
+import heapq
 import sys
 import traceback
 import warnings
-from functools import partial
+from functools import lru_cache, partial
+from itertools import islice
+from operator import itemgetter
 
 from eliot.parse import WrittenAction, WrittenMessage, Task
 from six import text_type
-from toolz import compose, excepts, identity
+from toolz import excepts, identity, partition_all
 
 from eliottree import format
-from eliottree.tree_format import format_tree, Options, ASCII_OPTIONS
+from eliottree.tree_format import format_tree_lines, Options, ASCII_OPTIONS
 from eliottree._color import colored
+from eliottree._parse import TaskShape
 from eliottree._util import eliot_ns, format_namespace, is_namespace
 from eliottree._theme import get_theme
 
 
+# We want tree-format to handle newlines.
+_escape_value = format.control_character_escaper(overrides={0x0a: u'\n'})
+_escape = format.control_character_escaper()
+
+
+#: Number of rendered lines passed to ``write`` at a time, bounding the memory
+#: used to render a task regardless of its size.
+WRITE_BATCH_LINES = 256
+
+#: Number of distinct sets of message field names whose sorted order is
+#: cached by `message_fields`.
+MESSAGE_SHAPE_CACHE_SIZE = 1024
+
 DEFAULT_IGNORED_KEYS = set([
     u'action_status', u'action_type', u'task_level', u'task_uuid',
     u'message_type'])
@@ -36,16 +53,16 @@ def _default_value_formatter(
                 utc_timestamps=utc_timestamps),
             eliot_ns(u'duration'): format.duration(),
         }
-    return compose(
-        # We want tree-format to handle newlines.
-        partial(format.escape_control_characters, overrides={0x0a: u'\n'}),
-        partial(format.truncate_value,
-                field_limit) if field_limit else identity,
-        format.some(
-            format.fields(fields),
-            format.text(),
-            format.binary(encoding),
-            format.anything(encoding)))
+    format_value = format.dispatch(encoding, fields, limit=field_limit)
+    if field_limit:
+        def _format_value(value, field_name=None):
+            return _escape_value(
+                format.truncate_value(
+                    field_limit, format_value(value, field_name)))
+    else:
+        def _format_value(value, field_name=None):
+            return _escape_value(format_value(value, field_name))
+    return _format_value
 
 
 def message_name(theme, format_value, message, end_message=None, options=None):
@@ -62,7 +79,7 @@ def message_name(theme, format_value, message, end_message=None, options=None):
             format_value(
                 message.timestamp, field_name=eliot_ns('timestamp')))
         if u'action_type' in message.contents:
-            action_type = format.escape_control_characters(
+            action_type = _escape(
                 message.contents.action_type)
             duration = u''
             if end_message:
@@ -89,7 +106,7 @@ def message_name(theme, format_value, message, end_message=None, options=None):
                 timestamp,
                 duration)
         elif u'message_type' in message.contents:
-            message_type = format.escape_control_characters(
+            message_type = _escape(
                 message.contents.message_type)
             return u'{}{} {}'.format(
                 theme.parent(message_type),
@@ -98,6 +115,51 @@ def message_name(theme, format_value, message, end_message=None, options=None):
     return u'<unnamed>'
 
 
+def _duration_stats(theme, format_value, node, options):
+    """
+    Format the minimum, mean and maximum durations of a `CollapsedActions` or
+    `TaskShape` node, if there are any.
+    """
+    def _duration(label, seconds):
+        return u'{} {}'.format(
+            label,
+            theme.duration(
+                format_value(seconds, field_name=eliot_ns('duration'))))
+
+    if node.mean_duration is None:
+        return u''
+    return u' {} {}, {}, {}'.format(
+        options.HOURGLASS,
+        _duration(u'min', node.min_duration),
+        _duration(u'avg', node.mean_duration),
+        _duration(u'max', node.max_duration))
+
+
+def _collapsed_name(theme, format_value, node, options):
+    """
+    Derive the name for a `CollapsedActions` node.
+    """
+    status_color = identity
+    if node.status == u'succeeded':
+        status_color = theme.status_success
+    elif node.status == u'failed':
+        status_color = theme.status_failure
+    start_message = node.actions[0].start_message
+    timestamp = u''
+    if start_message is not None:
+        timestamp = u' ' + theme.timestamp(
+            format_value(
+                start_message.timestamp, field_name=eliot_ns('timestamp')))
+    return u'{} {} {} {} {}{}{}'.format(
+        theme.parent(_escape(node.action_type)),
+        options.TIMES,
+        len(node.actions),
+        options.ARROW,
+        status_color(node.status or u''),
+        timestamp,
+        _duration_stats(theme, format_value, node, options))
+
+
 def format_node(format_value, theme, options, node):
     """
     Format a node for display purposes.
@@ -107,11 +169,24 @@ def format_node(format_value, theme, options, node):
         - `eliot.parse.WrittenAction`: An action's type, level and status.
         - `eliot.parse.WrittenMessage`: A message's type and level.
         - ``tuple``: A field name and value.
+        - `ElidedItems`: A count of nested values that are not rendered.
+        - `ElidedNodes`: A summary of actions and messages that are not
+          rendered.
+        - `CollapsedActions`: An action type and status, and the number and
+          durations of the actions collapsed.
+        - `TaskShape`: The task UUID of the representative task, and the
+          number and durations of the tasks with its shape.
     """
     if isinstance(node, Task):
         return u'{}'.format(
             theme.root(
-                format.escape_control_characters(node.root().task_uuid)))
+                _escape(node.root().task_uuid)))
+    elif isinstance(node, TaskShape):
+        return u'{} {} {}{}'.format(
+            theme.root(_escape(node.task.root().task_uuid)),
+            options.TIMES,
+            node.count,
+            _duration_stats(theme, format_value, node, options))
     elif isinstance(node, WrittenAction):
         return message_name(
             theme,
@@ -125,6 +200,36 @@ def format_node(format_value, theme, options, node):
             format_value,
             node,
             options=options)
+    elif isinstance(node, ElidedItems):
+        if node.more:
+            noun = u'more'
+        else:
+            noun = u'item' if node.count == 1 else u'items'
+        return theme.prop_value(u'\u2026 {} {}'.format(node.count, noun))
+    elif isinstance(node, CollapsedActions):
+        return _collapsed_name(theme, format_value, node, options)
+    elif isinstance(node, ElidedNodes):
+        counts = []
+        if node.actions:
+            counts.append(_pluralize(node.actions, u'action'))
+        if node.messages:
+            counts.append(_pluralize(node.messages, u'message'))
+        failed = u''
+        if node.failed:
+            failed = u' ({} failed)'.format(
+                theme.status_failure(text_type(node.failed)))
+        duration = u''
+        if node.duration is not None:
+            duration = u' {} {}'.format(
+                options.HOURGLASS,
+                theme.duration(
+                    format_value(
+                        node.duration, field_name=eliot_ns('duration'))))
+        return u'{} {}{}{}'.format(
+            theme.parent(u'\u2026'),
+            u', '.join(counts),
+            failed,
+            duration)
     elif isinstance(node, tuple):
         key, value = node
         if isinstance(value, (dict, list)):
@@ -134,49 +239,305 @@ def format_node(format_value, theme, options, node):
         if is_namespace(key):
             key = format_namespace(key)
         return u'{}: {}'.format(
-            theme.prop_key(format.escape_control_characters(key)),
+            theme.prop_key(_escape(key)),
             theme.prop_value(text_type(value)))
     raise NotImplementedError()
 
 
+def _field_sortkey(key):
+    return format_namespace(key) if is_namespace(key) else key
+
+
+@lru_cache(maxsize=MESSAGE_SHAPE_CACHE_SIZE)
+def _sorted_keys(keys):
+    """
+    Sorted order of a set of message field names, cached for each distinct
+    set since messages of the same type usually have the same fields.
+    """
+    return tuple(sorted(keys, key=_field_sortkey))
+
+
 def message_fields(message, ignored_fields):
     """
     Sorted fields for a `WrittenMessage`.
     """
-    def _items():
-        for key, value in message.contents.items():
-            if key not in ignored_fields:
-                yield key, value
+    if not message:
+        return []
+    contents = message.contents
+    return [
+        (key, contents[key])
+        for key in _sorted_keys(frozenset(contents))
+        if key not in ignored_fields]
+
+
+class ElidedItems(object):
+    """
+    Summary node standing in for nested dict or list items that are not
+    rendered.
+
+    :ivar int count: Number of items elided.
+    :ivar bool more: Are the items elided in addition to some that are
+    rendered?
+    """
+    __slots__ = ['count', 'more']
+
+    def __init__(self, count, more):
+        self.count = count
+        self.more = more
+
+    def __repr__(self):
+        return '<ElidedItems count={!r} more={!r}>'.format(
+            self.count, self.more)
+
+    def __eq__(self, other):
+        if not isinstance(other, ElidedItems):
+            return NotImplemented
+        return (self.count, self.more) == (other.count, other.more)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+
+class ElidedNodes(object):
+    """
+    Summary node standing in for actions and messages that are not rendered.
+
+    :ivar int actions: Number of actions elided, including nested actions.
+    :ivar int messages: Number of messages elided, including those within
+    nested actions.
+    :ivar int failed: Number of elided actions that failed.
+    :ivar duration: Total duration, in seconds, of the outermost elided
+    actions, or ``None`` if none of them has finished.
+    """
+    __slots__ = ['actions', 'messages', 'failed', 'duration']
+
+    def __init__(self, actions=0, messages=0, failed=0, duration=None):
+        self.actions = actions
+        self.messages = messages
+        self.failed = failed
+        self.duration = duration
+
+    def __repr__(self):
+        return (
+            '<ElidedNodes actions={!r} messages={!r} failed={!r} '
+            'duration={!r}>'.format(
+                self.actions, self.messages, self.failed, self.duration))
+
+    @classmethod
+    def summarize(cls, nodes):
+        """
+        Summarize ``nodes``, and all the actions and messages within them, in
+        a single pass without formatting any of them.
+
+        :type nodes: ``List[Union[WrittenAction, WrittenMessage,
+        CollapsedActions]]``
+        """
+        summary = cls()
+        nodes = [
+            action
+            for node in nodes
+            for action in (
+                node.actions if isinstance(node, CollapsedActions)
+                else [node])]
+        for node in nodes:
+            if isinstance(node, WrittenAction):
+                duration = _action_duration(node)
+                if duration is not None:
+                    summary.duration = (summary.duration or 0) + duration
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, WrittenAction):
+                summary.actions += 1
+                end_message = node.end_message
+                if (end_message
+                        and end_message.contents.action_status == u'failed'):
+                    summary.failed += 1
+                stack.extend(node.children)
+            else:
+                summary.messages += 1
+        return summary
+
+
+class CollapsedActions(object):
+    """
+    Summary node standing in for consecutive sibling actions with the same
+    action type and status.
+
+    :ivar actions: The collapsed actions.
+    :ivar action_type: Their action type.
+    :ivar status: Their status.
+    :ivar min_duration: Shortest duration, in seconds, or ``None`` if none of
+    the actions has finished.
+    :ivar mean_duration: Mean duration, or ``None``.
+    :ivar max_duration: Longest duration, or ``None``.
+    """
+    __slots__ = [
+        'actions', 'action_type', 'status', 'min_duration', 'mean_duration',
+        'max_duration']
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.action_type = actions[0].action_type
+        self.status = actions[0].status
+        durations = [
+            duration for duration in map(_action_duration, actions)
+            if duration is not None]
+        self.min_duration = self.mean_duration = self.max_duration = None
+        if durations:
+            self.min_duration = min(durations)
+            self.mean_duration = sum(durations) / float(len(durations))
+            self.max_duration = max(durations)
+
+    def __repr__(self):
+        return '<CollapsedActions action_type={!r} status={!r} count={!r}>'.format(
+            self.action_type, self.status, len(self.actions))
+
+
+def _collapse_repeated(children):
+    """
+    Collapse runs of consecutive sibling actions with the same action type and
+    status into `CollapsedActions` nodes.
+    """
+    result = []
+    run = []
+    run_key = None
+    for child in children + [None]:
+        key = None
+        if isinstance(child, WrittenAction):
+            key = child.action_type, child.status
+            if run and key == run_key:
+                run.append(child)
+                continue
+        if len(run) > 1:
+            result.append(CollapsedActions(run))
+        else:
+            result.extend(run)
+        run = []
+        run_key = key
+        if key is not None:
+            run.append(child)
+        elif child is not None:
+            result.append(child)
+    return result
+
 
-    def _sortkey(x):
-        k = x[0]
-        return format_namespace(k) if is_namespace(k) else k
-    return sorted(_items(), key=_sortkey) if message else []
+def _action_duration(action):
+    """
+    Duration of an action, in seconds, or ``None`` if it has not finished.
+    """
+    if action.start_message and action.end_message:
+        return action.end_message.timestamp - action.start_message.timestamp
+    return None
 
 
-def get_children(ignored_fields, node):
+def _pluralize(count, noun):
+    return u'{} {}{}'.format(count, noun, u'' if count == 1 else u's')
+
+
+class _NestedField(tuple):
+    """
+    A ``(key, value)`` field node that knows how deeply it is nested within a
+    message's values, used when limiting nesting.
+    """
+    def __new__(cls, key, value, nesting):
+        self = tuple.__new__(cls, (key, value))
+        self.nesting = nesting
+        return self
+
+
+def _value_children(node, value, max_items, max_nesting):
+    """
+    Retrieve the child nodes for a ``dict`` or ``list`` field value, rendering
+    no more than ``max_items`` items or ``max_nesting`` levels deep.
+
+    Items beyond the limit are summarized by an `ElidedItems` node, and are
+    never sorted.
+    """
+    nesting = getattr(node, 'nesting', 1)
+    if max_nesting is not None and nesting >= max_nesting:
+        return [ElidedItems(len(value), more=False)] if value else []
+    elided = 0
+    if max_items is not None and len(value) > max_items:
+        elided = len(value) - max_items
+    if isinstance(value, dict):
+        if elided:
+            items = heapq.nsmallest(
+                max_items, value.items(), key=itemgetter(0))
+        else:
+            items = sorted(value.items())
+    elif elided:
+        items = enumerate(islice(value, max_items))
+    else:
+        items = enumerate(value)
+    if max_nesting is not None:
+        items = [_NestedField(k, v, nesting + 1) for k, v in items]
+    else:
+        items = list(items)
+    if elided:
+        items.append(ElidedItems(elided, more=True))
+    return items
+
+
+def get_children(ignored_fields, node, max_items=None, max_nesting=None,
+                 max_depth=None, max_children=None, collapse_repeated=False):
     """
     Retrieve the child nodes for a node.
 
     The various types of node have different concepts of children:
         - `eliot.parse.Task`: The root ``WrittenAction``.
+        - `TaskShape`: The root ``WrittenAction`` of the representative task.
         - `eliot.parse.WrittenAction`: The start message fields, child
           ``WrittenAction`` or ``WrittenMessage``s, and end ``WrittenMessage``.
         - `eliot.parse.WrittenMessage`: Message fields.
         - ``tuple``: Contained values for `dict` and `list` types.
+
+    :param int max_items: Maximum number of items of a `dict` or `list` value
+    to include, or ``None`` for no limit.
+    :param int max_nesting: Maximum depth of nested `dict` or `list` values to
+    include, or ``None`` for no limit.
+    :param int max_depth: Maximum depth of actions, the root action being the
+    first level, whose child actions and messages are included; deeper ones
+    are summarized by an `ElidedNodes` node. ``None`` for no limit.
+    :param int max_children: Maximum number of child actions and messages of
+    an action to include, the remainder are summarized by an `ElidedNodes`
+    node. ``None`` for no limit.
+    :param bool collapse_repeated: Collapse consecutive child actions with the
+    same action type and status into a `CollapsedActions` node?
     """
     if isinstance(node, Task):
         return [node.root()]
+    elif isinstance(node, TaskShape):
+        return [node.task.root()]
     elif isinstance(node, WrittenAction):
+        children = list(node.children)
+        if collapse_repeated:
+            children = _collapse_repeated(children)
+        if (max_depth is not None
+                and children
+                and len(node.task_level.level) + 1 >= max_depth):
+            children = [ElidedNodes.summarize(children)]
+        elif max_children is not None and len(children) > max_children:
+            children = (
+                children[:max_children]
+                + [ElidedNodes.summarize(children[max_children:])])
         return filter(None,
                       (message_fields(node.start_message, ignored_fields)
-                       + list(node.children)
+                       + children
                        + [node.end_message]))
     elif isinstance(node, WrittenMessage):
         return message_fields(node, ignored_fields)
     elif isinstance(node, tuple):
         value = node[1]
-        if isinstance(value, dict):
+        if max_items is not None or max_nesting is not None:
+            if isinstance(value, (dict, list)):
+                return _value_children(node, value, max_items, max_nesting)
+        elif isinstance(value, dict):
             return sorted(value.items())
         elif isinstance(value, list):
             return enumerate(value)
@@ -214,11 +575,208 @@ class ColorizedOptions(object):
         return self.depth_colors[depth % len(self.depth_colors)]
 
 
+class RenderPlan(object):
+    """
+    Node formatting and traversal, for `format_tree_lines`, specialized for a
+    single set of rendering options. See `render_plan`.
+
+    :ivar format_node: Callable to format a node.
+    :ivar get_children: Callable to retrieve the child nodes of a node.
+    :ivar options: `Options` for `format_tree_lines`.
+    """
+    __slots__ = ['format_node', 'get_children', 'options']
+
+    def __init__(self, format_node, get_children, options):
+        self.format_node = format_node
+        self.get_children = get_children
+        self.options = options
+
+
+def render_plan(format_value, theme, options, ignored_fields, max_items=None,
+                max_nesting=None, max_depth=None, max_children=None,
+                collapse_repeated=False):
+    """
+    Specialize `format_node`, `get_children` and `ColorizedOptions.color` for
+    a set of rendering options, producing the same output.
+
+    Node types are dispatched with a single lookup, rather than a chain of
+    ``isinstance`` checks, and options are resolved once rather than for each
+    node. Message contents, which Eliot recreates each time they are
+    accessed, are retrieved once for each message being formatted.
+
+    :param format_value: See `render_tasks`.
+    :param Theme theme: Theme to use for rendering.
+    :param options: `Options` for `format_tree_lines`, possibly
+    `ColorizedOptions`.
+    :type ignored_fields: ``Set[text_type]``
+    :param ignored_fields: Set of field names to ignore.
+    :param max_items: See `get_children`.
+    :param max_nesting: See `get_children`.
+    :param max_depth: See `get_children`.
+    :param max_children: See `get_children`.
+    :param collapse_repeated: See `get_children`.
+    :rtype: RenderPlan
+    """
+    _format_node = partial(format_node, format_value, theme, options)
+    _get_children = partial(
+        get_children, ignored_fields,
+        max_items=max_items, max_nesting=max_nesting,
+        max_depth=max_depth, max_children=max_children,
+        collapse_repeated=collapse_repeated)
+    timestamp_field = eliot_ns('timestamp')
+    duration_field = eliot_ns('duration')
+    arrow = options.ARROW
+    hourglass = options.HOURGLASS
+    theme_root = theme.root
+    theme_parent = theme.parent
+    theme_task_level = theme.task_level
+    theme_timestamp = theme.timestamp
+    theme_duration = theme.duration
+    theme_prop_value = theme.prop_value
+    status_success = theme.status_success
+    status_failure = theme.status_failure
+    # The two messages whose contents were most recently retrieved, usually
+    # an action's start and end messages.
+    recent = [None, None, None, None]
+
+    def _contents(message):
+        if message is recent[0]:
+            return recent[1]
+        if message is recent[2]:
+            return recent[3]
+        contents = message.contents
+        recent[2:] = recent[:2]
+        recent[:2] = message, contents
+        return contents
+
+    def _message_name(message, end_message):
+        if message is None:
+            return u'<unnamed>'
+        contents = _contents(message)
+        timestamp = theme_timestamp(
+            format_value(message.timestamp, field_name=timestamp_field))
+        if u'action_type' in contents:
+            action_type = _escape(contents.action_type)
+            duration = u''
+            if end_message:
+                duration = u' {} {}'.format(
+                    hourglass,
+                    theme_duration(
+                        format_value(
+                            end_message.timestamp - message.timestamp,
+                            field_name=duration_field)))
+                action_status = _contents(end_message).action_status
+            else:
+                action_status = contents.action_status
+            status_color = identity
+            if action_status == u'succeeded':
+                status_color = status_success
+            elif action_status == u'failed':
+                status_color = status_failure
+            return u'{}{} {} {} {}{}'.format(
+                theme_parent(action_type),
+                theme_task_level(message.task_level.to_string()),
+                arrow,
+                status_color(contents.action_status),
+                timestamp,
+                duration)
+        elif u'message_type' in contents:
+            return u'{}{} {}'.format(
+                theme_parent(_escape(contents.message_type)),
+                theme_task_level(message.task_level.to_string()),
+                timestamp)
+        return u'<unnamed>'
+
+    @lru_cache(maxsize=MESSAGE_SHAPE_CACHE_SIZE)
+    def _field_key(key):
+        if is_namespace(key):
+            key = format_namespace(key)
+        return theme.prop_key(_escape(key))
+
+    def _format_field(node):
+        key, value = node
+        if isinstance(value, (dict, list)):
+            value = u''
+        else:
+            value = format_value(value, key)
+        return u'{}: {}'.format(
+            _field_key(key), theme_prop_value(text_type(value)))
+
+    formatters = {
+        Task: lambda node: u'{}'.format(
+            theme_root(_escape(node.root().task_uuid))),
+        WrittenAction: lambda node: _message_name(
+            node.start_message, node.end_message),
+        WrittenMessage: lambda node: _message_name(node, None),
+        tuple: _format_field,
+        _NestedField: _format_field,
+    }
+
+    def _plan_format_node(node):
+        return formatters.get(type(node), _format_node)(node)
+
+    @lru_cache(maxsize=MESSAGE_SHAPE_CACHE_SIZE)
+    def _field_names(keys):
+        return tuple(key for key in _sorted_keys(keys)
+                     if key not in ignored_fields)
+
+    def _message_fields(message):
+        if not message:
+            return []
+        contents = _contents(message)
+        return [(key, contents[key])
+                for key in _field_names(frozenset(contents))]
+
+    def _action_children(node):
+        return filter(None,
+                      (_message_fields(node.start_message)
+                       + list(node.children)
+                       + [node.end_message]))
+
+    def _plain_value_children(node):
+        value = node[1]
+        if isinstance(value, dict):
+            return sorted(value.items())
+        elif isinstance(value, list):
+            return enumerate(value)
+        return []
+
+    children = {
+        Task: lambda node: [node.root()],
+        WrittenMessage: _message_fields,
+    }
+    if (max_depth is None and max_children is None
+            and not collapse_repeated):
+        children[WrittenAction] = _action_children
+    if max_items is None and max_nesting is None:
+        children[tuple] = _plain_value_children
+
+    def _plan_get_children(node):
+        return children.get(type(node), _get_children)(node)
+
+    if isinstance(options, ColorizedOptions):
+        failed_color = options.failed_color
+        depth_colors = tuple(options.depth_colors)
+        options = ColorizedOptions(failed_color, depth_colors, options.options)
+
+        def _color(node, depth):
+            if isinstance(node, WrittenAction):
+                end_message = node.end_message
+                if (end_message
+                        and _contents(end_message).action_status == u'failed'):
+                    return failed_color
+            return depth_colors[depth % len(depth_colors)]
+        options.color = _color
+
+    return RenderPlan(_plan_format_node, _plan_get_children, options)
+
+
 def render_tasks(write, tasks, field_limit=0, ignored_fields=None,
                  human_readable=False, colorize=None, write_err=None,
-                 format_node=format_node, format_value=None,
+                 format_node=None, format_value=None,
                  utc_timestamps=True, colorize_tree=False, ascii=False,
-                 theme=None):
+                 theme=None, max_items=None, max_nesting=None, max_depth=None,
+                 max_children=None, collapse_repeated=False):
     """
     Render Eliot tasks as an ASCII tree.
 
@@ -226,7 +784,8 @@ def render_tasks(write, tasks, field_limit=0, ignored_fields=None,
     :param write: Callable used to write the output.
     :type tasks: ``Iterable``
     :param tasks: Iterable of parsed Eliot tasks, as returned by
-    `eliottree.tasks_from_iterable`.
+    `eliottree.tasks_from_iterable`, or of `TaskShape` groups, as returned by
+    `eliottree.group_tasks_by_shape`.
     :param int field_limit: Length at which to begin truncating, ``0`` means no
     truncation.
     :type ignored_fields: ``Set[text_type]``
@@ -236,13 +795,24 @@ def render_tasks(write, tasks, field_limit=0, ignored_fields=None,
     :param bool colorize: Colorized the output? (Deprecated, use `theme`.)
     :type write_err: Callable[[`text_type`], None]
     :param write_err: Callable used to write errors.
-    :param format_node: See `format_node`.
+    :param format_node: See `format_node`, defaults to a version specialized
+    for the other options by `render_plan`.
     :type format_value: Callable[[Any], `text_type`]
     :param format_value: Callable to format a value.
     :param bool utc_timestamps: Format timestamps as UTC?
     :param int colorize_tree: Colorizing the tree output?
     :param bool ascii: Render the tree as plain ASCII instead of Unicode?
     :param Theme theme: Theme to use for rendering.
+    :param int max_items: Maximum number of items of nested `dict` or `list`
+    field values to render, the remainder are summarized.
+    :param int max_nesting: Maximum depth of nested `dict` or `list` field
+    values to render, deeper values are summarized.
+    :param int max_depth: Maximum depth of actions whose children are
+    rendered, deeper actions and messages are summarized.
+    :param int max_children: Maximum number of child actions and messages of
+    each action to render, the remainder are summarized.
+    :param bool collapse_repeated: Collapse consecutive sibling actions with
+    the same action type and status into a single node?
     """
     def make_options():
         if ascii:
@@ -279,14 +849,31 @@ def render_tasks(write, tasks, field_limit=0, ignored_fields=None,
         format_value,
         caught_exceptions,
         u'<value formatting exception>')
+    if format_node is None:
+        plan = render_plan(
+            _format_value, theme, options, ignored_fields,
+            max_items=max_items, max_nesting=max_nesting,
+            max_depth=max_depth, max_children=max_children,
+            collapse_repeated=collapse_repeated)
+    else:
+        plan = RenderPlan(
+            partial(format_node, _format_value, theme, options),
+            partial(
+                get_children, ignored_fields,
+                max_items=max_items, max_nesting=max_nesting,
+                max_depth=max_depth, max_children=max_children,
+                collapse_repeated=collapse_repeated),
+            options)
     _format_node = track_exceptions(
-        partial(format_node, _format_value, theme, options),
+        plan.format_node,
         caught_exceptions,
         u'<node formatting exception>')
-    _get_children = partial(get_children, ignored_fields)
 
     for task in tasks:
-        write(format_tree(task, _format_node, _get_children, options))
+        lines = format_tree_lines(
+            task, _format_node, plan.get_children, plan.options)
+        for batch in partition_all(WRITE_BATCH_LINES, lines):
+            write(u'\n'.join(batch) + u'\n')
         write(u'\n')
 
     if write_err and caught_exceptions:
@@ -1,31 +1,528 @@
+import operator
+import re
 from datetime import datetime
+from functools import partial
+from itertools import chain, compress, islice, repeat
+from numbers import Number
 
+import iso8601
 import jmespath
 from iso8601.iso8601 import UTC
+from six import text_type, unichr
+from six.moves import filter, map
+
+from eliottree._errors import FilterExpressionError
+from eliottree._expression import parse as parse_expression
+
+
+#: Rough relative cost of evaluating a filter, used by `combine_filters_and`
+#: to decide which filters to evaluate first.
+COST_CHEAP = 1
+COST_COMPILED = 4
+COST_DEFAULT = 10
+COST_EXPENSIVE = 50
+
+
+def _with_cost(cost, f):
+    """
+    Annotate filter ``f`` with its rough evaluation cost.
+    """
+    f.cost = cost
+    return f
+
+
+def _with_batch_filter(batch_filter, f):
+    """
+    Annotate filter ``f`` with an equivalent filter over a batch of messages,
+    for `filter_batches`.
+    """
+    f.batch_filter = batch_filter
+    return f
+
+
+class _NotCompilable(Exception):
+    """
+    A jmespath expression contains a construct that `_compile_jmespath` does
+    not know how to compile.
+    """
+
+
+class _Fallback(Exception):
+    """
+    A compiled jmespath expression encountered a value it cannot evaluate
+    identically to the jmespath interpreter.
+    """
+
+
+def _is_number(x):
+    """
+    Is this a number, in the jmespath sense, which excludes ``bool``?
+    """
+    return isinstance(x, Number) and not isinstance(x, bool)
+
+
+def _jmespath_equals(x, y):
+    """
+    Equality as jmespath defines it, where ``0`` and ``1`` are not equal to
+    ``False`` and ``True``.
+    """
+    if _is_number(x) and x in (0, 1):
+        if isinstance(y, bool):
+            return False
+    elif _is_number(y) and y in (0, 1):
+        if isinstance(x, bool):
+            return False
+    return x == y
+
+
+def _jmespath_false(value):
+    """
+    Is this value false, in the jmespath sense?
+    """
+    return (value == u'' or value == [] or value == {} or value is None
+            or value is False)
+
+
+_comparators = {
+    u'eq': _jmespath_equals,
+    u'ne': lambda x, y: not _jmespath_equals(x, y),
+    u'lt': operator.lt,
+    u'gt': operator.gt,
+    u'lte': operator.le,
+    u'gte': operator.ge,
+}
+
+
+def _compile_field(names):
+    """
+    Compile a chain of field lookups, such as ``a.b.c``.
+    """
+    if len(names) == 1:
+        name = names[0]
+
+        def _field(value):
+            try:
+                return value.get(name)
+            except AttributeError:
+                return None
+        return _field
+
+    def _fields(value):
+        for name in names:
+            try:
+                value = value.get(name)
+            except AttributeError:
+                return None
+        return value
+    return _fields
+
+
+def _compile_jmespath(node):
+    """
+    Compile a parsed jmespath expression into a function of one argument that
+    produces the same result as the jmespath interpreter.
+
+    Only common predicate shapes are supported: fields and nested fields,
+    literals, ``@``, comparisons, ``&&``, ``||``, ``!`` and ``contains()``.
+
+    :raise _NotCompilable: If the expression contains anything else.
+    :raise _Fallback: (From the compiled function) If a value is encountered
+    that must be evaluated by the jmespath interpreter, such as an argument
+    type error.
+    """
+    node_type = node[u'type']
+    children = node[u'children']
+    if node_type == u'field':
+        return _compile_field([node[u'value']])
+    elif node_type in (u'subexpression', u'pipe'):
+        if all(child[u'type'] == u'field' for child in children):
+            return _compile_field([child[u'value'] for child in children])
+        fs = [_compile_jmespath(child) for child in children]
+
+        def _subexpression(value):
+            for f in fs:
+                value = f(value)
+            return value
+        return _subexpression
+    elif node_type == u'literal':
+        literal = node[u'value']
+        return lambda value: literal
+    elif node_type == u'current':
+        return lambda value: value
+    elif node_type == u'comparator':
+        op = _comparators[node[u'value']]
+        left, right = map(_compile_jmespath, children)
+        if node[u'value'] in (u'eq', u'ne'):
+            if children[1][u'type'] == u'literal':
+                literal = children[1][u'value']
+                return lambda value: op(left(value), literal)
+            return lambda value: op(left(value), right(value))
+
+        def _ordering(value):
+            x, y = left(value), right(value)
+            if _is_number(x) and _is_number(y):
+                return op(x, y)
+            elif isinstance(x, text_type) and isinstance(y, text_type):
+                return op(x, y)
+            elif ((_is_number(x) or isinstance(x, text_type))
+                  and (_is_number(y) or isinstance(y, text_type))):
+                raise _Fallback()
+            return None
+        return _ordering
+    elif node_type == u'and_expression':
+        left, right = map(_compile_jmespath, children)
+
+        def _and(value):
+            result = left(value)
+            if _jmespath_false(result):
+                return result
+            return right(value)
+        return _and
+    elif node_type == u'or_expression':
+        left, right = map(_compile_jmespath, children)
+
+        def _or(value):
+            result = left(value)
+            if _jmespath_false(result):
+                return right(value)
+            return result
+        return _or
+    elif node_type == u'not_expression':
+        f = _compile_jmespath(children[0])
+
+        def _not(value):
+            result = f(value)
+            if _is_number(result) and result == 0:
+                return False
+            return not result
+        return _not
+    elif (node_type == u'function_expression'
+          and node[u'value'] == u'contains'
+          and len(children) == 2):
+        subject, search = map(_compile_jmespath, children)
+
+        def _contains(value):
+            _subject = subject(value)
+            if not isinstance(_subject, (list, text_type)):
+                raise _Fallback()
+            return search(value) in _subject
+        return _contains
+    raise _NotCompilable(node_type)
+
+
+_mirrored_comparators = {
+    u'eq': u'eq',
+    u'ne': u'ne',
+    u'lt': u'gt',
+    u'gt': u'lt',
+    u'lte': u'gte',
+    u'gte': u'lte',
+}
+
+_column_comparators = {
+    u'eq': operator.eq,
+    u'ne': operator.ne,
+    u'lt': operator.lt,
+    u'gt': operator.gt,
+    u'lte': operator.le,
+    u'gte': operator.ge,
+}
+
+_NUMBER_TYPES = frozenset([int, float])
+_NUMBER_OR_NULL_TYPES = _NUMBER_TYPES | {type(None)}
+
+
+def _compile_jmespath_batch(node):
+    """
+    Compile a parsed jmespath expression into a function of a `_Columns`
+    batch that produces a list of results, one for each message, that are
+    true for the same messages as the jmespath interpreter.
+
+    Only comparisons between a top-level field and a text (for ``==`` and
+    ``!=``) or number literal are supported.
+
+    :raise _NotCompilable: If the expression contains anything else.
+    :raise _Fallback: (From the compiled function) If a column contains values
+    that must be evaluated one message at a time.
+    """
+    if node[u'type'] != u'comparator':
+        raise _NotCompilable(node[u'type'])
+    name = node[u'value']
+    field, literal = node[u'children']
+    if field[u'type'] == u'literal':
+        field, literal = literal, field
+        name = _mirrored_comparators[name]
+    if field[u'type'] != u'field' or literal[u'type'] != u'literal':
+        raise _NotCompilable(node[u'type'])
+    field = field[u'value']
+    literal = literal[u'value']
+    op = _column_comparators[name]
+    if isinstance(literal, text_type) and name in (u'eq', u'ne'):
+        def _text(columns):
+            return list(map(op, columns[field], repeat(literal)))
+        return _text
+    elif _is_number(literal) and name not in (u'eq', u'ne'):
+        def _number(columns):
+            column = columns[field]
+            types = set(map(type, column))
+            if types <= _NUMBER_TYPES:
+                return list(map(op, column, repeat(literal)))
+            elif types <= _NUMBER_OR_NULL_TYPES:
+                return [x is not None and op(x, literal) for x in column]
+            raise _Fallback()
+        return _number
+    raise _NotCompilable(node[u'type'])
+
+
+# Characters that JSON encoders never escape, so appear verbatim in a raw line.
+_JSON_VERBATIM = frozenset(
+    unichr(c) for c in range(0x20, 0x7f) if unichr(c) not in u'"\\/')
+_REGEX_SPECIAL = frozenset(u'.^$*+?{}[]\\|()')
+_REGEX_REPEAT = re.compile(u'\\{\\d*(?:,\\d*)?\\}')
+_REGEX_ESCAPE_ARGUMENT = {u'x': 2, u'u': 4, u'U': 8}
+
+
+def _escape_end(pattern, i):
+    """
+    Index just after the argument, if any, of the alphanumeric regular
+    expression escape whose letter or digit is at ``i``.
+
+    Digits following an octal escape or backreference are all consumed,
+    which may skip a literal digit but never mistakes part of the escape for
+    a literal.
+    """
+    escaped = pattern[i]
+    if escaped in _REGEX_ESCAPE_ARGUMENT:
+        return i + 1 + _REGEX_ESCAPE_ARGUMENT[escaped]
+    elif escaped == u'N' and pattern[i + 1:i + 2] == u'{':
+        end = pattern.find(u'}', i)
+        return len(pattern) if end == -1 else end + 1
+    elif escaped.isdigit():
+        i += 1
+        while pattern[i:i + 1].isdigit():
+            i += 1
+        return i
+    return i + 1
+
+
+def _required_literal(regex):
+    """
+    Find a literal string that must appear, verbatim, in the JSON encoding of
+    any text matched by ``regex``.
+
+    This is deliberately conservative and only considers literal characters
+    outside of any group, returning ``None`` when unsure.
+
+    :rtype: ``Optional[text_type]``
+    """
+    if regex.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+    pattern = regex.pattern
+    if not isinstance(pattern, text_type) or u'|' in pattern:
+        return None
+    runs = []
+    run = []
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        literal = None
+        if c == u'\\':
+            i += 1
+            escaped = pattern[i:i + 1]
+            if escaped and not escaped.isalnum():
+                literal = escaped
+            elif escaped:
+                i = _escape_end(pattern, i) - 1
+        elif c == u'{' and _REGEX_REPEAT.match(pattern, i):
+            # Skip the repetition, the preceding item was already made
+            # optional.
+            i = _REGEX_REPEAT.match(pattern, i).end() - 1
+        elif c == u'[':
+            # Skip the character class.
+            i += 1
+            if pattern[i:i + 1] == u'^':
+                i += 1
+            if pattern[i:i + 1] == u']':
+                i += 1
+            while i < len(pattern) and pattern[i] != u']':
+                i += 2 if pattern[i] == u'\\' else 1
+        elif c == u'(':
+            depth += 1
+        elif c == u')':
+            depth -= 1
+        elif c not in _REGEX_SPECIAL:
+            literal = c
+        i += 1
+        quantifier = pattern[i:i + 1]
+        if (quantifier in (u'*', u'?')
+                or quantifier == u'{' and _REGEX_REPEAT.match(pattern, i)):
+            # The preceding item is optional.
+            literal = None
+        if (literal is not None
+                and depth == 0
+                and literal in _JSON_VERBATIM):
+            run.append(literal)
+        elif run:
+            runs.append(u''.join(run))
+            run = []
+        if quantifier == u'+' and run:
+            runs.append(u''.join(run))
+            run = []
+    if run:
+        runs.append(u''.join(run))
+    if not runs:
+        return None
+    return max(runs, key=len)
+
+
+def filter_by_field_regex(field, pattern):
+    """
+    Produce a function for filtering tasks whose ``field`` value matches a
+    regular expression.
+
+    ``field`` may name a nested field with ``.``, such as ``request.uri``.
+    Only text values are matched; numbers, booleans, lists and objects never
+    match, since their representation in the log is not known once decoded.
+
+    The filter has a ``line_filter`` attribute, a cheap necessary condition
+    that can be tested against the raw JSON line before decoding it, if a
+    literal string that every match must contain can be found.
+    """
+    def _filter(task):
+        value = get_value(task)
+        if not isinstance(value, text_type):
+            return False
+        return search(value) is not None
+
+    regex = re.compile(pattern)
+    search = regex.search
+    get_value = _compile_field(field.split(u'.'))
+    literal = _required_literal(regex)
+    if literal is not None:
+        _filter.line_filter = lambda line: literal in line
+    return _with_cost(COST_COMPILED, _filter)
+
+
+def _is_field(node, field):
+    """
+    Is this parsed jmespath expression a lookup of the top-level ``field``?
+    """
+    return node[u'type'] == u'field' and node[u'value'] == field
+
+
+def _required_values(node, field):
+    """
+    Determine the text values that ``field`` must be equal to in order for the
+    parsed jmespath expression ``node`` to be true.
+
+    :return: ``Set[text_type]``, or ``None`` if ``field`` is not constrained
+    to a known set of values.
+    """
+    node_type = node[u'type']
+    children = node[u'children']
+    if node_type == u'comparator' and node[u'value'] == u'eq':
+        for a, b in [children, reversed(children)]:
+            if (_is_field(a, field)
+                    and b[u'type'] == u'literal'
+                    and isinstance(b[u'value'], text_type)):
+                return {b[u'value']}
+    elif node_type == u'and_expression':
+        left, right = [_required_values(child, field) for child in children]
+        if left is None:
+            return right
+        elif right is None:
+            return left
+        return left & right
+    elif node_type == u'or_expression':
+        left, right = [_required_values(child, field) for child in children]
+        if left is not None and right is not None:
+            return left | right
+    elif (node_type == u'function_expression'
+          and node[u'value'] == u'contains'
+          and len(children) == 2
+          and children[0][u'type'] == u'literal'
+          and isinstance(children[0][u'value'], list)
+          and _is_field(children[1], field)):
+        values = children[0][u'value']
+        if all(isinstance(value, text_type) for value in values):
+            return set(values)
+    return None
+
+
+def _jmespath_field_values(query, field):
+    """
+    Determine the text values that ``field`` must be equal to for a message to
+    match a jmespath query expression.
+
+    :return: ``Set[text_type]``, or ``None`` if the query does not constrain
+    ``field`` to a known set of values.
+    """
+    return _required_values(jmespath.compile(query).parsed, field)
 
 
 def filter_by_jmespath(query):
     """
     Produce a function for filtering a task by a jmespath query expression.
+
+    Common predicate shapes are compiled into native Python functions, anything
+    else is evaluated by the jmespath interpreter.
     """
-    def _filter(task):
+    def _search(task):
         return bool(expn.search(task))
+
+    def _filter(task):
+        try:
+            return bool(compiled(task))
+        except _Fallback:
+            return _search(task)
     expn = jmespath.compile(query)
-    return _filter
+    try:
+        compiled = _compile_jmespath(expn.parsed)
+    except _NotCompilable:
+        return _with_cost(COST_EXPENSIVE, _search)
+    _filter = _with_cost(COST_COMPILED, _filter)
+    try:
+        return _with_batch_filter(_compile_jmespath_batch(expn.parsed), _filter)
+    except _NotCompilable:
+        return _filter
 
 
 def filter_by_uuid(task_uuid):
     """
     Produce a function for filtering tasks by their UUID.
     """
-    return filter_by_jmespath(u'task_uuid == `{}`'.format(task_uuid))
+    def _filter(task):
+        return task.get(u'task_uuid') == task_uuid
 
+    def _batch_filter(columns):
+        return list(map(operator.eq, columns[u'task_uuid'], repeat(task_uuid)))
+    return _with_batch_filter(_batch_filter, _with_cost(COST_CHEAP, _filter))
 
-def _parse_timestamp(timestamp):
+
+def filter_by_uuids(task_uuids):
     """
-    Parse a timestamp into a UTC L{datetime}.
+    Produce a function for filtering tasks by any of several UUIDs.
+
+    :type task_uuids: ``Iterable[text_type]``
     """
-    return datetime.utcfromtimestamp(timestamp).replace(tzinfo=UTC)
+    def _filter(task):
+        return task.get(u'task_uuid') in task_uuids
+
+    def _batch_filter(columns):
+        return list(map(task_uuids.__contains__, columns[u'task_uuid']))
+    task_uuids = frozenset(task_uuids)
+    return _with_batch_filter(_batch_filter, _with_cost(COST_CHEAP, _filter))
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def _to_timestamp(date):
+    """
+    Convert a timezone-aware L{datetime} into a POSIX timestamp.
+    """
+    return (date - _EPOCH).total_seconds()
 
 
 def filter_by_start_date(start_date):
@@ -34,8 +531,12 @@ def filter_by_start_date(start_date):
     date and time.
     """
     def _filter(task):
-        return _parse_timestamp(task[u'timestamp']) >= start_date
-    return _filter
+        return task[u'timestamp'] >= start
+
+    def _batch_filter(columns):
+        return list(map(operator.ge, columns[u'timestamp'], repeat(start)))
+    start = _to_timestamp(start_date)
+    return _with_batch_filter(_batch_filter, _with_cost(COST_CHEAP, _filter))
 
 
 def filter_by_end_date(end_date):
@@ -44,18 +545,439 @@ def filter_by_end_date(end_date):
     and time.
     """
     def _filter(task):
-        return _parse_timestamp(task[u'timestamp']) < end_date
+        return task[u'timestamp'] < end
+
+    def _batch_filter(columns):
+        return list(map(operator.lt, columns[u'timestamp'], repeat(end)))
+    end = _to_timestamp(end_date)
+    return _with_batch_filter(_batch_filter, _with_cost(COST_CHEAP, _filter))
+
+
+def filter_by_date_range(start_date=None, end_date=None):
+    """
+    Produce a function for filtering by task timestamps after (or on)
+    ``start_date`` and before ``end_date``, either of which may be ``None`` to
+    leave that end of the range open.
+    """
+    if start_date is None and end_date is None:
+        return _with_cost(COST_CHEAP, lambda task: True)
+    elif start_date is None:
+        return filter_by_end_date(end_date)
+    elif end_date is None:
+        return filter_by_start_date(start_date)
+
+    def _filter(task):
+        return start <= task[u'timestamp'] < end
+
+    def _batch_filter(columns):
+        return [start <= timestamp < end
+                for timestamp in columns[u'timestamp']]
+    start = _to_timestamp(start_date)
+    end = _to_timestamp(end_date)
+    return _with_batch_filter(_batch_filter, _with_cost(COST_CHEAP, _filter))
+
+
+def filter_tasks_by_duration(min_duration=None, max_duration=None):
+    """
+    Produce a task filter, for `tasks_from_iterable`, selecting tasks whose
+    root action's duration, in seconds, is within a range.
+
+    Tasks are rejected as soon as their messages span more than
+    ``max_duration``, or their root action ends in less than ``min_duration``.
+    """
+    def _filter(summary):
+        duration = summary.duration
+        if duration is None:
+            if max_duration is not None and summary.span > max_duration:
+                return False
+            return None
+        if min_duration is not None and duration < min_duration:
+            return False
+        if max_duration is not None and duration > max_duration:
+            return False
+        return True
+    return _filter
+
+
+def filter_tasks_failed():
+    """
+    Produce a task filter, for `tasks_from_iterable`, selecting tasks that
+    contain a failed action.
+
+    Tasks are rejected as soon as their root action ends without any action
+    having failed.
+    """
+    def _filter(summary):
+        if summary.failed:
+            return True
+        elif summary.root_status is not None:
+            return False
+        return None
+    return _filter
+
+
+def combine_task_filters_and(*filters):
+    """
+    Combine several task filters together in a logical-AND fashion.
+
+    A task is rejected as soon as any filter rejects it, and only kept once
+    every filter keeps it.
+    """
+    if len(filters) == 1:
+        return filters[0]
+    _filter = _verdict_and(filters)
+    _filter.message_predicates = [
+        predicate
+        for f in filters
+        for predicate in getattr(f, 'message_predicates', ())]
+    return _filter
+
+
+def _verdict_and(fs):
+    """
+    Three-valued logical AND of task filters: ``False`` if any filter is
+    ``False``, otherwise ``None`` if any filter is undecided.
+    """
+    def _and(summary):
+        result = True
+        for f in fs:
+            verdict = f(summary)
+            if verdict is False:
+                return False
+            elif verdict is None:
+                result = None
+        return result
+    return _and
+
+
+def _verdict_or(fs):
+    """
+    Three-valued logical OR of task filters: ``True`` if any filter is
+    ``True``, otherwise ``None`` if any filter is undecided.
+    """
+    def _or(summary):
+        result = False
+        for f in fs:
+            verdict = f(summary)
+            if verdict is True:
+                return True
+            elif verdict is None:
+                result = None
+        return result
+    return _or
+
+
+def _verdict_not(f):
+    """
+    Three-valued logical NOT of a task filter.
+    """
+    def _not(summary):
+        verdict = f(summary)
+        if verdict is None:
+            return None
+        return not verdict
+    return _not
+
+
+def _any_message(predicate):
+    """
+    Task filter that is ``True`` once any message in the task satisfies
+    ``predicate``, and ``False`` if none has by the time the task is finished.
+    """
+    def _filter(summary):
+        if predicate in summary.matched:
+            return True
+        elif summary.finished:
+            return False
+        return None
+    return _filter
+
+
+_duration_ops = {
+    u'<': operator.lt,
+    u'<=': operator.le,
+    u'>': operator.gt,
+    u'>=': operator.ge,
+    u'=': operator.eq,
+    u':': operator.eq,
+}
+
+
+def _duration_leaf(op, limit):
+    """
+    Task filter comparing the root action's duration with ``limit``.
+    """
+    compare = _duration_ops[op]
+
+    def _filter(summary):
+        duration = summary.duration
+        if duration is not None:
+            return compare(duration, limit)
+        elif summary.finished:
+            return False
+        elif op != u'>' and op != u'>=' and summary.span > limit:
+            # The task has already run for too long.
+            return False
+        return None
+    return _filter
+
+
+def _expression_leaf(expression, predicate, message_predicates):
+    """
+    Compile a filter expression predicate into a task filter, recording any
+    message filters that `TaskSummary` must evaluate.
+    """
+    _, name, op, value = predicate
+
+    def _message(f):
+        message_predicates.append(f)
+        return _any_message(f)
+
+    def _expect(*ops):
+        if op not in ops:
+            raise FilterExpressionError(
+                expression,
+                u'Operator {!r} is not valid for {!r}'.format(op, name))
+
+    def _date():
+        try:
+            return iso8601.parse_date(value)
+        except iso8601.ParseError as e:
+            raise FilterExpressionError(expression, text_type(e))
+
+    if name == u'uuid':
+        _expect(u':', u'=', u'!=')
+        if op == u'!=':
+            return lambda summary: summary.task_uuid != value
+        return lambda summary: summary.task_uuid == value
+    elif name == u'status':
+        _expect(u':', u'=')
+        return _message(
+            _with_cost(
+                COST_CHEAP,
+                lambda message: message.get(u'action_status') == value))
+    elif name == u'start':
+        _expect(u':', u'>=')
+        return _message(filter_by_start_date(_date()))
+    elif name == u'end':
+        _expect(u':', u'<')
+        return _message(filter_by_end_date(_date()))
+    elif name == u'duration':
+        _expect(*_duration_ops)
+        try:
+            limit = float(value)
+        except ValueError:
+            raise FilterExpressionError(
+                expression, u'Invalid duration {!r}'.format(value))
+        return _duration_leaf(op, limit)
+    elif name in (u'select', u'jmespath'):
+        _expect(u':')
+        try:
+            return _message(filter_by_jmespath(value))
+        except jmespath.exceptions.JMESPathError as e:
+            raise FilterExpressionError(expression, text_type(e))
+    raise FilterExpressionError(
+        expression, u'Unknown predicate {!r}'.format(name))
+
+
+def filter_tasks_by_expression(expression):
+    """
+    Produce a task filter, for `tasks_from_iterable`, selecting tasks that
+    satisfy a boolean filter expression.
+
+    Expressions combine predicates with ``and``, ``or``, ``not`` and
+    parentheses, for example::
+
+        uuid:1234 or (status:failed and not duration<0.5)
+
+    The available predicates are:
+
+        - ``uuid:UUID``, ``uuid!=UUID``: The task's UUID.
+        - ``status:STATUS``: Any action in the task has the status.
+        - ``start:DATE``, ``end:DATE``: Any message in the task occurs after
+          (or on), or before, an ISO8601 date.
+        - ``duration<SECONDS`` (also ``<=``, ``>``, ``>=``, ``=``): The root
+          action's duration.
+        - ``select:QUERY``: Any message in the task matches a JMESPath query.
+
+    The expression is compiled once into an evaluation plan in which identical
+    subexpressions are shared, and in which evaluation short-circuits. Tasks
+    are discarded as soon as the expression is known to be false.
+
+    :raise FilterExpressionError: If the expression is invalid.
+    """
+    def _compile(node):
+        f = compiled.get(node)
+        if f is not None:
+            return f
+        kind = node[0]
+        if kind == u'and':
+            f = _verdict_and([_compile(child) for child in node[1]])
+        elif kind == u'or':
+            f = _verdict_or([_compile(child) for child in node[1]])
+        elif kind == u'not':
+            f = _verdict_not(_compile(node[1]))
+        else:
+            f = _expression_leaf(expression, node, message_predicates)
+        compiled[node] = f
+        return f
+
+    compiled = {}
+    message_predicates = []
+    _filter = _compile(parse_expression(expression))
+    _filter.message_predicates = message_predicates
     return _filter
 
 
-def combine_filters_and(*filters):
+def combine_filters_and(*filters, **kw):
     """
     Combine several filters together in a logical-AND fashion.
+
+    Filters are initially evaluated cheapest first, according to their
+    ``cost`` attribute (`COST_DEFAULT` if they have none). The rate at which
+    each filter rejects values is tracked and, every ``reorder_interval``
+    values, the filters are reordered so that those most likely to cheaply
+    reject a value are evaluated first. Filters are expected to be pure
+    predicates, since the order in which they are evaluated may change.
+
+    :param int reorder_interval: Number of values to evaluate between
+    reorderings, ``0`` disables adaptive reordering.
+    """
+    def _rank(i):
+        # Expected cost of rejecting a value with this filter, using a smoothed
+        # rejection rate so that unobserved filters are not ranked infinitely.
+        return costs[i] * (evaluated[i] + 2) / (rejected[i] + 1)
+
+    def _reorder():
+        calls[0] = 0
+        order[:] = sorted(order, key=_rank)
+
+    def _filter(value):
+        calls[0] += 1
+        if calls[0] >= reorder_interval:
+            _reorder()
+        for i in order:
+            evaluated[i] += 1
+            if not filters[i](value):
+                rejected[i] += 1
+                return False
+        return True
+
+    reorder_interval = kw.pop('reorder_interval', 1000)
+    if kw:
+        raise TypeError('Unexpected keyword arguments', kw)
+    filters = list(filters)
+    costs = [getattr(f, 'cost', COST_DEFAULT) for f in filters]
+    if not filters:
+        return lambda value: True
+    elif len(filters) == 1:
+        f = filters[0]
+        return lambda value: bool(f(value))
+    order = sorted(range(len(filters)), key=costs.__getitem__)
+    if not reorder_interval:
+        ordered = [filters[i] for i in order]
+
+        def _static_filter(value):
+            for f in ordered:
+                if not f(value):
+                    return False
+            return True
+        return _static_filter
+    evaluated = [0] * len(filters)
+    rejected = [0] * len(filters)
+    calls = [0]
+    return _filter
+
+
+#: Default number of messages in a batch evaluated by `filter_batches`.
+DEFAULT_BATCH_SIZE = 4096
+
+
+class _Columns(object):
+    """
+    Columns of top-level field values, extracted on demand, from a batch of
+    message dictionaries.
+    """
+    def __init__(self, messages, columns=None):
+        self.messages = messages
+        self._columns = columns or {}
+
+    def __getitem__(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            try:
+                column = list(map(dict.get, self.messages, repeat(field)))
+            except TypeError:
+                # Mappings that are not dictionaries.
+                column = list(
+                    map(operator.methodcaller('get', field), self.messages))
+            self._columns[field] = column
+        return column
+
+    def narrow(self, mask):
+        """
+        Columns for only the messages selected by ``mask``, keeping any
+        columns already extracted.
+        """
+        return _Columns(
+            list(compress(self.messages, mask)),
+            {field: list(compress(column, mask))
+             for field, column in self._columns.items()})
+
+
+def _filter_batch(batched, batch):
+    """
+    Evaluate batch filters, in order, over a batch of messages, narrowing the
+    batch to the messages selected by each filter before evaluating the next.
+    """
+    columns = _Columns(batch)
+    for f in batched:
+        if not columns.messages:
+            break
+        try:
+            mask = f.batch_filter(columns)
+        except (_Fallback, TypeError, AttributeError):
+            mask = list(map(bool, map(f, columns.messages)))
+        columns = columns.narrow(mask)
+    return columns.messages
+
+
+def filter_batches(filters, iterable, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Filter message dictionaries, in a logical-AND fashion, a batch at a time.
+
+    Filters with a ``batch_filter`` attribute are evaluated, cheapest first,
+    over columns of field values for the whole batch, rather than once for
+    each message, and each narrows the batch evaluated by the next. Any other
+    filters are then evaluated for each message that remains. If a column
+    contains values that a batch filter cannot handle, such as values of mixed
+    types, that filter is evaluated for each remaining message in the batch
+    instead, so the result is always the same as filtering with
+    `combine_filters_and`.
+
+    :type filters: ``List[Callable[[Dict], bool]]``
+    :type iterable: ``Iterable[Dict]``
+    :param int batch_size: Number of messages to evaluate in each batch.
+    :rtype: ``Iterable[Dict]``
     """
-    return lambda value: all(f(value) for f in filters)
+    batched = sorted(
+        (f for f in filters if hasattr(f, 'batch_filter')),
+        key=lambda f: getattr(f, 'cost', COST_DEFAULT))
+    others = [f for f in filters if not hasattr(f, 'batch_filter')]
+    iterator = iter(iterable)
+    batches = iter(lambda: list(islice(iterator, batch_size)), [])
+    if batched:
+        batches = map(partial(_filter_batch, batched), batches)
+    messages = chain.from_iterable(batches)
+    if others:
+        messages = filter(combine_filters_and(*others), messages)
+    return messages
 
 
 __all__ = [
-    'filter_by_jmespath', 'filter_by_uuid', 'filter_by_start_date',
-    'filter_by_end_date', 'combine_filters_and',
+    'filter_by_jmespath', 'filter_by_uuid', 'filter_by_uuids',
+    'filter_by_field_regex', 'filter_by_start_date', 'filter_by_end_date',
+    'filter_by_date_range', 'filter_tasks_by_duration', 'filter_tasks_failed',
+    'filter_tasks_by_expression', 'combine_filters_and',
+    'combine_task_filters_and', 'filter_batches', 'DEFAULT_BATCH_SIZE',
 ]
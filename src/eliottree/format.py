@@ -1,19 +1,61 @@
+import math
+import re
 from datetime import datetime
+from functools import lru_cache
 
 from six import binary_type, text_type, unichr
-from toolz import merge
 
 
 _control_equivalents = dict((i, unichr(0x2400 + i)) for i in range(0x20))
 _control_equivalents[0x7f] = u'\u2421'
 
 
+def control_character_escaper(overrides={}):
+    """
+    Create a function that replaces terminal control characters with their
+    Unicode control character equivalent.
+
+    The translation table is built once, and text without any characters to
+    replace is returned without being translated.
+
+    :type overrides: ``Dict[int, Optional[text_type]]``
+    :param overrides: Replacements, by code point, to use instead of the
+    Unicode control character equivalents, as accepted by `str.translate`.
+    """
+    def _escape(s):
+        s = text_type(s)
+        if search(s) is None:
+            return s
+        return s.translate(table)
+
+    table = dict(_control_equivalents)
+    table.update(overrides)
+    replaced = sorted(
+        c for c, replacement in table.items()
+        if replacement != c and replacement != unichr(c))
+    if not replaced:
+        return text_type
+    search = re.compile(u'[{}]'.format(
+        u''.join(re.escape(unichr(c)) for c in replaced))).search
+    return _escape
+
+
+_escapers = {}
+
+
 def escape_control_characters(s, overrides={}):
     """
     Replace terminal control characters with their Unicode control character
     equivalent.
+
+    Prefer `control_character_escaper` in loops, to avoid looking up the
+    escaper for ``overrides`` on every call.
     """
-    return text_type(s).translate(merge(_control_equivalents, overrides))
+    key = frozenset(overrides.items())
+    escape = _escapers.get(key)
+    if escape is None:
+        escape = _escapers[key] = control_character_escaper(overrides)
+    return escape(s)
 
 
 def some(*fs):
@@ -66,21 +108,54 @@ def fields(format_mapping):
     return _format_field_value
 
 
+#: Number of formatted seconds cached by `timestamp`.
+TIMESTAMP_CACHE_SIZE = 4096
+
+# Fractions of a second at or above which `datetime.fromtimestamp` rounds up
+# to the next second.
+_ROUNDS_UP = 0.9999995
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _format_seconds(seconds, utc_timestamps):
+    """
+    Format a whole number of seconds since the epoch, as UTC or local time, in
+    ISO 8601.
+    """
+    from_timestamp = (
+        datetime.utcfromtimestamp
+        if utc_timestamps else datetime.fromtimestamp)
+    result = from_timestamp(seconds).isoformat(' ')
+    if isinstance(result, binary_type):
+        result = result.decode('ascii')
+    return result
+
+
 def timestamp(include_microsecond=True, utc_timestamps=True):
     """
     Create a formatter for POSIX timestamp values.
+
+    Without microseconds, timestamps are formatted once for each second, in
+    UTC or local time, and cached.
     """
     def _format_timestamp_value(value, field_name=None):
-        from_timestamp = (
-            datetime.utcfromtimestamp
-            if utc_timestamps else datetime.fromtimestamp)
-        result = from_timestamp(float(value))
+        value = float(value)
+        if not include_microsecond:
+            seconds = math.floor(value)
+            if value - seconds < _ROUNDS_UP:
+                return _format_seconds(int(seconds), utc_timestamps) + suffix
+        result = from_timestamp(value)
         if not include_microsecond:
             result = result.replace(microsecond=0)
         result = result.isoformat(' ')
         if isinstance(result, binary_type):
             result = result.decode('ascii')
-        return result + (u'Z' if utc_timestamps else u'')
+        return result + suffix
+
+    from_timestamp = (
+        datetime.utcfromtimestamp
+        if utc_timestamps else datetime.fromtimestamp)
+    suffix = u'Z' if utc_timestamps else u''
     return _format_timestamp_value
 
 
@@ -93,31 +168,169 @@ def duration():
     return _format_duration
 
 
-def anything(encoding):
+_brackets = {
+    list: (u'[', u']'),
+    tuple: (u'(', u')'),
+    dict: (u'{', u'}'),
+}
+_end = object()
+
+
+def _repr_pieces(value):
+    """
+    Produce the `repr` of a value in pieces, descending into lists, tuples and
+    dicts (but not their subclasses, which may customize their `repr`) so that
+    the `repr` of a large container can be abandoned part way through.
+    """
+    stack = []
+    active = set()
+    while True:
+        value_type = type(value)
+        brackets = _brackets.get(value_type)
+        if brackets is None or not value:
+            yield repr(value)
+        elif id(value) in active:
+            # A recursive container, represented as `repr` does.
+            yield u'{}...{}'.format(*brackets)
+        else:
+            yield brackets[0]
+            active.add(id(value))
+            items = iter(value.items() if value_type is dict else value)
+            stack.append([value, items, True])
+        while stack:
+            frame = stack[-1]
+            container, items, first = frame
+            item = next(items, _end)
+            if item is _end:
+                stack.pop()
+                active.discard(id(container))
+                if type(container) is tuple and len(container) == 1:
+                    yield u','
+                yield _brackets[type(container)][1]
+                continue
+            if not first:
+                yield u', '
+            frame[2] = False
+            if type(container) is dict:
+                key, value = item
+                yield repr(key)
+                yield u': '
+            else:
+                value = item
+            break
+        else:
+            return
+
+
+def bounded_repr(value, limit, encoding='utf-8'):
+    """
+    The `repr` of a value, stopping once more than ``limit`` characters, or a
+    newline, have been produced.
+
+    The result is a prefix of ``repr(value)`` that `truncate_value` truncates
+    to the same result as the complete `repr`.
+
+    :param str encoding: Encoding to assume for a `binary_type` `repr`.
+    """
+    pieces = []
+    length = 0
+    for piece in _repr_pieces(value):
+        if isinstance(piece, binary_type):
+            piece = piece.decode(encoding, 'replace')
+        pieces.append(piece)
+        length += len(piece)
+        if length > limit or u'\n' in piece:
+            break
+    return u''.join(pieces)
+
+
+def anything(encoding, limit=None):
     """
     Create a formatter for any value using `repr`.
 
     :param str encoding: Encoding to assume for a `binary_type` result.
+    :param int limit: Length, if the result will be truncated by
+    `truncate_value`, at which to stop producing the `repr`; see
+    `bounded_repr`.
     """
     def _format_other_value(value, field_name=None):
         result = repr(value)
         if isinstance(result, binary_type):
             result = result.decode(encoding, 'replace')
         return result
+
+    def _format_bounded_value(value, field_name=None):
+        return bounded_repr(value, limit, encoding)
+
+    if limit:
+        return _format_bounded_value
     return _format_other_value
 
 
+def _type_formatter(value_type, encoding, limit):
+    """
+    Choose the formatter for values of ``value_type``.
+    """
+    if issubclass(value_type, text_type):
+        return text()
+    elif issubclass(value_type, binary_type):
+        return binary(encoding)
+    return anything(encoding, limit)
+
+
+def dispatch(encoding, format_mapping=None, limit=None):
+    """
+    Create a formatter for any value, equivalent to::
+
+        some(fields(format_mapping), text(), binary(encoding),
+             anything(encoding))
+
+    but choosing a formatter with a single lookup, by field name and then by
+    type, instead of trying each in turn.
+
+    :param str encoding: Encoding to assume for ``binary_type`` values.
+    :type format_mapping: ``Dict[text_type, Callable[[Any, text_type], Any]]``
+    :param format_mapping: Formatters for specific field names.
+    :param int limit: Length, if the result will be truncated by
+    `truncate_value`, at which to stop producing the `repr` of other values.
+    """
+    def _format_value(value, field_name=None):
+        if format_mapping:
+            f = format_mapping.get(field_name)
+            if f is not None:
+                result = f(value, field_name)
+                if result is not None:
+                    return result
+        value_type = type(value)
+        f = types.get(value_type)
+        if f is None:
+            f = types[value_type] = _type_formatter(
+                value_type, encoding, limit)
+        return f(value, field_name)
+
+    types = {
+        text_type: lambda value, field_name=None: value,
+        binary_type: binary(encoding),
+    }
+    return _format_value
+
+
 def truncate_value(limit, value):
     """
-    Truncate ``value`` to a maximum of ``limit`` characters.
+    Truncate ``value`` to a maximum of ``limit`` characters, or its first
+    line, whichever is shorter.
+
+    Only the first ``limit + 1`` characters of ``value`` are inspected.
     """
-    values = value.split(u'\n')
-    value = values[0]
-    if len(value) > limit or len(values) > 1:
-        return u'{}\u2026'.format(value[:limit])
+    head = value[:limit + 1]
+    newline = head.find(u'\n')
+    if newline != -1:
+        return head[:newline] + u'\u2026'
+    elif len(head) > limit:
+        return head[:limit] + u'\u2026'
     return value
 
 
 __all__ = [
-    'escape_control_characters', 'some', 'binary', 'text', 'fields',
-    'timestamp', 'anything', 'truncate_value']
+    'escape_control_characters', 'control_character_escaper', 'some', 'binary', 'text', 'fields',
+    'timestamp', 'anything', 'bounded_repr', 'dispatch', 'truncate_value']
@@ -1,3 +1,6 @@
+from eliottree._parse import TaskSummary
+
+
 unnamed_message = {
     u"task_uuid": u"cdeb220d-7605-4d5f-8341-1a170222e308",
     u"error": False,
@@ -89,3 +92,65 @@ missing_uuid_task = {
     u"message_type": u"twisted:log",
     u"action_type": u"nope",
     u"task_level": [1]}
+
+
+def _branching_message(task_level, timestamp, **fields):
+    message = {
+        u"task_uuid": u"0d5b7af1-09e1-4a4b-9c33-0b3e3c9a1c5e",
+        u"task_level": task_level,
+        u"timestamp": timestamp}
+    message.update(fields)
+    return message
+
+
+branching_task_messages = [
+    _branching_message(
+        [1], 10, action_type=u"app:root", action_status=u"started"),
+    _branching_message([2], 11, message_type=u"app:log"),
+    _branching_message(
+        [3, 1], 12, action_type=u"app:child", action_status=u"started"),
+    _branching_message([3, 2], 12.5, message_type=u"app:log"),
+    _branching_message(
+        [3, 3], 13, action_type=u"app:child", action_status=u"failed",
+        exception=u"ValueError", reason=u"nope"),
+    _branching_message(
+        [4, 1], 13, action_type=u"app:child", action_status=u"started"),
+    _branching_message(
+        [4, 2], 14.5, action_type=u"app:child", action_status=u"succeeded"),
+    _branching_message(
+        [5], 20, action_type=u"app:root", action_status=u"succeeded")]
+
+
+def _polling_task_messages():
+    messages = [
+        _branching_message(
+            [1], 10, action_type=u"app:root", action_status=u"started")]
+    for i, (duration, status) in enumerate([(0.5, u"succeeded"),
+                                            (1, u"succeeded"),
+                                            (1.5, u"succeeded"),
+                                            (1, u"failed")]):
+        messages.extend([
+            _branching_message(
+                [i + 2, 1], 11 + i,
+                action_type=u"app:poll", action_status=u"started"),
+            _branching_message(
+                [i + 2, 2], 11 + i + duration,
+                action_type=u"app:poll", action_status=status)])
+    messages.extend([
+        _branching_message([6], 20, message_type=u"app:log"),
+        _branching_message(
+            [7], 21, action_type=u"app:root", action_status=u"succeeded")])
+    return messages
+
+
+polling_task_messages = _polling_task_messages()
+
+
+def summarize(*messages):
+    """
+    Summarize serialized Eliot message dictionaries with a `TaskSummary`.
+    """
+    summary = TaskSummary()
+    for message in messages:
+        summary.add(message)
+    return summary
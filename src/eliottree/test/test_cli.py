@@ -8,8 +8,12 @@ from collections import namedtuple
 from subprocess import PIPE, CalledProcessError, Popen
 from unittest import TestCase
 
+from eliottree._cli import parse_messages
 from eliottree._compat import dump_json_bytes
-from eliottree.test.tasks import message_task, missing_uuid_task
+from eliottree._index import build_index
+from eliottree.test.tasks import (
+    action_task, action_task_end, action_task_end_failed, message_task,
+    missing_uuid_task, nested_action_task)
 
 
 rendered_message_task = (
@@ -104,6 +108,207 @@ class EndToEndTests(TestCase):
             self.assertEqual(check_output(["eliot-tree", f.name]),
                              rendered_message_task)
 
+    def test_task_uuids(self):
+        """
+        ``eliot-tree`` selects several tasks when ``--task-uuid`` is given
+        multiple times.
+        """
+        other_task = dict(message_task, task_uuid=u'other')
+        with NamedTemporaryFile() as f:
+            for task in [action_task, other_task, message_task]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never',
+                 '-u', action_task['task_uuid'],
+                 '-u', message_task['task_uuid'],
+                 f.name]).decode('utf-8')
+            self.assertIn(action_task['task_uuid'], output)
+            self.assertIn(message_task['task_uuid'], output)
+            self.assertNotIn(u'other', output)
+
+    def test_task_uuid_file(self):
+        """
+        ``eliot-tree`` selects tasks whose UUIDs are listed in a file given by
+        ``--task-uuid-file``, in addition to any ``--task-uuid`` options.
+        """
+        other_task = dict(nested_action_task, task_uuid=u'other')
+        with NamedTemporaryFile() as f, NamedTemporaryFile() as uuids:
+            for task in [action_task, other_task, message_task]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            uuids.write(
+                u'{}\n\n'.format(action_task['task_uuid']).encode('utf-8'))
+            uuids.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never',
+                 '--task-uuid-file', uuids.name,
+                 '-u', message_task['task_uuid'],
+                 f.name]).decode('utf-8')
+            self.assertIn(action_task['task_uuid'], output)
+            self.assertIn(message_task['task_uuid'], output)
+            self.assertNotIn(u'other', output)
+
+    def test_empty_task_uuid_file(self):
+        """
+        ``eliot-tree`` selects no tasks when ``--task-uuid-file`` names a file
+        without any UUIDs.
+        """
+        with NamedTemporaryFile() as f, NamedTemporaryFile() as uuids:
+            for task in [action_task, message_task]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            uuids.write(b'\n')
+            uuids.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never',
+                 '--task-uuid-file', uuids.name, f.name])
+            self.assertEqual(output, b'')
+
+    def test_duration(self):
+        """
+        ``eliot-tree`` selects tasks whose root action's duration is within
+        ``--min-duration`` and ``--max-duration``.
+        """
+        with NamedTemporaryFile() as f:
+            for task in [message_task, action_task, action_task_end]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never', '--min-duration', '1.5',
+                 '--max-duration', '2', f.name]).decode('utf-8')
+            self.assertIn(action_task['task_uuid'], output)
+            self.assertNotIn(message_task['task_uuid'], output)
+            output = check_output(
+                ['eliot-tree', '--color=never', '--min-duration', '2.5',
+                 f.name]).decode('utf-8')
+            self.assertEqual(output, u'')
+
+    def test_failed_only(self):
+        """
+        ``eliot-tree --failed-only`` selects only tasks containing a failed
+        action.
+        """
+        succeeded_task = dict(action_task, task_uuid=u'succeeded')
+        succeeded_task_end = dict(action_task_end, task_uuid=u'succeeded')
+        with NamedTemporaryFile() as f:
+            for task in [succeeded_task, action_task, message_task,
+                         succeeded_task_end, action_task_end_failed]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never', '--failed-only',
+                 f.name]).decode('utf-8')
+            self.assertIn(action_task['task_uuid'], output)
+            self.assertNotIn(u'succeeded', output.splitlines()[0])
+            self.assertNotIn(message_task['task_uuid'], output)
+
+    def test_filter_expression(self):
+        """
+        ``eliot-tree --filter`` selects tasks satisfying a filter expression.
+        """
+        with NamedTemporaryFile() as f:
+            for task in [message_task, action_task, action_task_end]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never', '--filter',
+                 'uuid:{} or status:failed'.format(message_task['task_uuid']),
+                 f.name])
+            self.assertEqual(output, rendered_message_task)
+
+    def test_filter_expression_invalid(self):
+        """
+        ``eliot-tree`` reports invalid filter expressions.
+        """
+        with NamedTemporaryFile() as f:
+            f.write(dump_json_bytes(message_task) + b'\n')
+            f.flush()
+            with self.assertRaises(CalledProcessError) as m:
+                check_output(
+                    ['eliot-tree', '--filter', 'uuid:a or', f.name])
+            self.assertIn(
+                b'Invalid filter expression', m.exception.output.stderr)
+
+    def test_match(self):
+        """
+        ``eliot-tree --match`` selects messages whose field value matches a
+        regular expression.
+        """
+        with NamedTemporaryFile() as f:
+            for task in [message_task, action_task]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never', '--match',
+                 'message=^Main loop', f.name])
+            self.assertEqual(output, rendered_message_task)
+
+    def test_batch_size(self):
+        """
+        ``eliot-tree --batch-size`` selects the same tasks when evaluating
+        selection criteria over batches of messages.
+        """
+        with NamedTemporaryFile() as f:
+            for task in [message_task, action_task]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never', '--batch-size', '1',
+                 '--select', 'message_type == `"twisted:log"`', f.name])
+            self.assertEqual(output, rendered_message_task)
+
+    def test_group_shapes(self):
+        """
+        ``eliot-tree --group-shapes`` renders one task of each shape, with the
+        number of tasks of that shape.
+        """
+        with NamedTemporaryFile() as f:
+            for i in range(3):
+                task = dict(message_task, task_uuid=u'task-{}'.format(i))
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            output = check_output(
+                ['eliot-tree', '--color=never', '--group-shapes', f.name])
+            self.assertEqual(
+                output.decode('utf-8').splitlines()[0],
+                u'task-0 \xd7 3')
+
+    def test_index(self):
+        """
+        ``eliot-tree --build-index`` writes an index for each file, which is
+        consulted when selecting tasks without changing the result.
+        """
+        with NamedTemporaryFile() as f:
+            for task in [message_task, action_task]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            self.addCleanup(os.unlink, f.name + '.eliottree-index')
+            check_output(
+                ['eliot-tree', '--build-index', '--index-region-size', '1',
+                 f.name])
+            self.assertTrue(os.path.exists(f.name + '.eliottree-index'))
+            self.assertEqual(
+                check_output(
+                    ['eliot-tree', '-u', message_task['task_uuid'], f.name]),
+                rendered_message_task)
+
+    def test_index_region_size_invalid(self):
+        """
+        ``eliot-tree --index-region-size`` rejects sizes that are not
+        positive, without writing an index.
+        """
+        with NamedTemporaryFile() as f:
+            f.write(dump_json_bytes(message_task) + b'\n')
+            f.flush()
+            for size in ['0', '-1']:
+                with self.assertRaises(CalledProcessError) as m:
+                    check_output(
+                        ['eliot-tree', '--build-index',
+                         '--index-region-size=' + size, f.name])
+                self.assertIn(b'positive', m.exception.output.stderr)
+            self.assertFalse(os.path.exists(f.name + '.eliottree-index'))
+
     def test_json_parse_error(self):
         """
         ``eliot-tree`` displays an error containing the file name, line number
@@ -139,3 +344,25 @@ class EndToEndTests(TestCase):
             self.assertIn('Eliot message parse error', first_line)
             self.assertIn(f.name, first_line)
             self.assertIn('line 1', first_line)
+
+
+class ParseMessagesTests(TestCase):
+    """
+    Tests for `eliottree._cli.parse_messages`.
+    """
+    def test_empty_task_uuids(self):
+        """
+        An empty list of task UUIDs selects no tasks, whether or not the file
+        has an index.
+        """
+        with NamedTemporaryFile() as f:
+            for task in [message_task, action_task]:
+                f.write(dump_json_bytes(task) + b'\n')
+            f.flush()
+            self.addCleanup(os.unlink, f.name + '.eliottree-index')
+            build_index(f.name)
+            for use_index in [True, False]:
+                with open(f.name) as fd:
+                    _, tasks = parse_messages(
+                        files=[fd], task_uuid=[], use_index=use_index)
+                    self.assertEqual(list(tasks), [])
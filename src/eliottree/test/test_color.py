@@ -0,0 +1,48 @@
+from testtools import TestCase
+from testtools.matchers import Is
+
+from eliottree._color import color_factory, colored
+from eliottree.test.matchers import ExactlyEquals
+
+
+class ColorFactoryTests(TestCase):
+    """
+    Tests for `eliottree._color.color_factory`.
+    """
+    def test_colored(self):
+        """
+        Colors wrap text in the same escape sequences as ``colored``.
+        """
+        for args in [('red',), ('blue', None, ['dim']),
+                     ('white', 'red', ['bold', 'underlined'])]:
+            color = color_factory(colored)(*args)
+            self.assertThat(
+                color(u'hello \N{SNOWMAN}'),
+                ExactlyEquals(colored(u'hello \N{SNOWMAN}', *args[:2],
+                                      attrs=(args[2:] or [None])[0])))
+            self.assertThat(
+                color(42),
+                ExactlyEquals(colored(42, *args[:2],
+                                      attrs=(args[2:] or [None])[0])))
+
+    def test_not_colored(self):
+        """
+        Colorizers that do not wrap text leave it untouched.
+        """
+        text = u'hello'
+        color = color_factory(lambda text, *a, **kw: text)('red')
+        self.assertThat(color(text), Is(text))
+
+    def test_not_wrapped(self):
+        """
+        Colorizers that do more than wrap text are called for every text.
+        """
+        calls = []
+
+        def _colored(text, fg, bg=None, attrs=None):
+            calls.append(text)
+            return u'<{}>{!r}</{}>'.format(fg, text, fg)
+        color = color_factory(_colored)('red')
+        del calls[:]
+        self.assertThat(color(u'hello'), ExactlyEquals(u"<red>{!r}</red>".format(u'hello')))
+        self.assertThat(calls, ExactlyEquals([u'hello']))
@@ -0,0 +1,75 @@
+from testtools import ExpectedException, TestCase
+from testtools.matchers import Equals
+
+from eliottree import FilterExpressionError
+from eliottree._expression import parse, tokenize
+
+
+class TokenizeTests(TestCase):
+    """
+    Tests for `eliottree._expression.tokenize`.
+    """
+    def test_tokens(self):
+        """
+        Expressions are split into parentheses, keywords and predicates.
+        """
+        self.assertThat(
+            tokenize(u'(uuid:a OR duration >= 2) and not status:failed'),
+            Equals([
+                (u'paren', u'('),
+                (u'predicate', u'uuid', u':', u'a'),
+                (u'keyword', u'or'),
+                (u'predicate', u'duration', u'>=', u'2'),
+                (u'paren', u')'),
+                (u'keyword', u'and'),
+                (u'keyword', u'not'),
+                (u'predicate', u'status', u':', u'failed')]))
+
+    def test_quoted(self):
+        """
+        Predicate values may be quoted, with backslash escapes.
+        """
+        self.assertThat(
+            tokenize(u'''select:'a == `"b c"`' select:"it\\"s"'''),
+            Equals([
+                (u'predicate', u'select', u':', u'a == `"b c"`'),
+                (u'predicate', u'select', u':', u'it"s')]))
+
+    def test_unknown_keyword(self):
+        """
+        Unknown keywords are errors.
+        """
+        with ExpectedException(FilterExpressionError, '.*xor.*'):
+            tokenize(u'uuid:a xor uuid:b')
+
+
+class ParseTests(TestCase):
+    """
+    Tests for `eliottree._expression.parse`.
+    """
+    def test_precedence(self):
+        """
+        ``not`` binds tighter than ``and``, which binds tighter than ``or``.
+        """
+        a, b, c = [(u'predicate', n, u':', u'1') for n in u'abc']
+        self.assertThat(
+            parse(u'a:1 or not b:1 and c:1'),
+            Equals((u'or', (a, (u'and', ((u'not', b), c))))))
+
+    def test_parentheses(self):
+        """
+        Parentheses group subexpressions.
+        """
+        a, b, c = [(u'predicate', n, u':', u'1') for n in u'abc']
+        self.assertThat(
+            parse(u'(a:1 or b:1) and c:1'),
+            Equals((u'and', ((u'or', (a, b)), c))))
+
+    def test_invalid(self):
+        """
+        Incomplete or malformed expressions are errors.
+        """
+        for expression in [u'', u'a:1 and', u'(a:1', u'a:1)', u'a:1 b:1',
+                           u'not', u'a']:
+            with ExpectedException(FilterExpressionError):
+                parse(expression)
@@ -1,14 +1,27 @@
+import json
+import re
 from calendar import timegm
 from datetime import datetime
 
+import jmespath
 from iso8601.iso8601 import UTC
-from testtools import TestCase
-from testtools.matchers import Equals
+from testtools import ExpectedException, TestCase
+from testtools.matchers import Equals, HasLength
 
 from eliottree import (
-    filter_by_end_date, filter_by_jmespath, filter_by_start_date,
-    filter_by_uuid)
-from eliottree.test.tasks import action_task, message_task
+    FilterExpressionError, combine_filters_and, combine_task_filters_and,
+    filter_batches, filter_by_date_range, filter_by_end_date,
+    filter_by_field_regex, filter_by_jmespath, filter_by_start_date,
+    filter_by_uuid, filter_by_uuids, filter_tasks_by_duration,
+    filter_tasks_by_expression, filter_tasks_failed, tasks_from_iterable)
+from eliottree._compat import dump_json_bytes
+from eliottree.filter import (
+    _NotCompilable, _compile_jmespath, _jmespath_field_values,
+    _required_literal)
+from eliottree._parse import TaskSummary
+from eliottree.test.tasks import (
+    action_task, action_task_end, action_task_end_failed, dict_action_task,
+    list_action_task, message_task, nested_action_task, summarize)
 
 
 class FilterByJmespath(TestCase):
@@ -32,6 +45,135 @@ class FilterByJmespath(TestCase):
             Equals(True))
 
 
+class CompileJmespathTests(TestCase):
+    """
+    Tests for ``eliottree.filter._compile_jmespath``.
+    """
+    tasks = [
+        message_task, action_task, action_task_end_failed, dict_action_task,
+        list_action_task,
+        dict(message_task, error=0, status=1, uri=u'/criticalEndpoint/x'),
+        dict(message_task, error=True, status=500, uri=[u'a', u'b']),
+        dict(message_task, message=u'', status=401.0)]
+
+    queries = [
+        u'action_type',
+        u'nope',
+        u'some_data.a',
+        u'some_data.a.b',
+        u'action_type == `"app:action"`',
+        u"action_status != 'failed'",
+        u'error == `false`',
+        u'error == `0`',
+        u'status == `1`',
+        u'status == `true`',
+        u'status > `400`',
+        u'status <= `401`',
+        u'some_data == `{"a": 42}`',
+        u'message && status',
+        u'error || message',
+        u'!message',
+        u'!error',
+        u'!nope && @',
+        u'contains(`[401, 500]`, status)',
+        u'uri && contains(uri, `"/criticalEndpoint"`)',
+        u'contains(some_data, `"b"`)',
+        u'contains(uri, `"b"`)',
+        u'action_type == `"app:action"` && (action_status == `"failed"` || '
+        u'!some_data)']
+
+    def test_compilable(self):
+        """
+        Common predicate shapes can be compiled.
+        """
+        for query in self.queries:
+            self.assertThat(
+                callable(_compile_jmespath(jmespath.compile(query).parsed)),
+                Equals(True))
+
+    def test_identical(self):
+        """
+        Compiled expressions produce the same result, or exception, as the
+        jmespath interpreter.
+        """
+        def _result(f, task):
+            try:
+                return bool(f(task))
+            except Exception as e:
+                return type(e)
+
+        for query in self.queries:
+            for task in self.tasks:
+                self.assertThat(
+                    (query, _result(filter_by_jmespath(query), task)),
+                    Equals(
+                        (query,
+                         _result(jmespath.compile(query).search, task))))
+
+    def test_not_compilable(self):
+        """
+        Expressions containing unsupported constructs cannot be compiled, and
+        are evaluated by the jmespath interpreter instead.
+        """
+        query = u'some_data[0] == `"a"`'
+        with ExpectedException(_NotCompilable):
+            _compile_jmespath(jmespath.compile(query).parsed)
+        self.assertThat(
+            filter_by_jmespath(query)(list_action_task),
+            Equals(True))
+        self.assertThat(
+            filter_by_jmespath(query)(dict_action_task),
+            Equals(False))
+
+    def test_fallback_error(self):
+        """
+        Values that the compiled expression cannot handle identically, such
+        as function argument type errors, are handed to the jmespath
+        interpreter.
+        """
+        query = u'contains(uri, `"/criticalEndpoint"`)'
+        with ExpectedException(jmespath.exceptions.JMESPathTypeError):
+            filter_by_jmespath(query)(message_task)
+
+
+class JmespathFieldValuesTests(TestCase):
+    """
+    Tests for ``eliottree.filter._jmespath_field_values``.
+    """
+    def test_unconstrained(self):
+        """
+        Queries that do not restrict the field to known text values do not
+        constrain it.
+        """
+        for query in [u'action_type',
+                      u'other == `"a"`',
+                      u'action_type != `"a"`',
+                      u'action_type == `1`',
+                      u'action_type == `"a"` || other',
+                      u'!(action_type == `"a"`)',
+                      u'contains(`["a", 1]`, action_type)']:
+            self.assertThat(
+                (query, _jmespath_field_values(query, u'action_type')),
+                Equals((query, None)))
+
+    def test_constrained(self):
+        """
+        Equality with text literals, conjunctions, disjunctions and
+        ``contains()`` on literal lists constrain the field's values.
+        """
+        for query, values in [
+                (u'action_type == `"a"`', {u'a'}),
+                (u"'a' == action_type", {u'a'}),
+                (u'action_type == `"a"` && other', {u'a'}),
+                (u'action_type == `"a"` && action_type == `"b"`', set()),
+                (u'action_type == `"a"` || action_type == `"b"`',
+                 {u'a', u'b'}),
+                (u'contains(`["a", "b"]`, action_type)', {u'a', u'b'})]:
+            self.assertThat(
+                (query, _jmespath_field_values(query, u'action_type')),
+                Equals((query, values)))
+
+
 class FilterByUUID(TestCase):
     """
     Tests for ``eliottree.filter_by_uuid``.
@@ -54,6 +196,169 @@ class FilterByUUID(TestCase):
             Equals(True))
 
 
+class FilterByUUIDs(TestCase):
+    """
+    Tests for ``eliottree.filter_by_uuids``.
+    """
+    def test_no_match(self):
+        """
+        Return ``False`` if the input is not any of the specified task UUIDs.
+        """
+        self.assertThat(
+            filter_by_uuids(['nope', 'also-nope'])(message_task),
+            Equals(False))
+        self.assertThat(
+            filter_by_uuids([])(message_task),
+            Equals(False))
+
+    def test_match(self):
+        """
+        Return ``True`` if the input is any of the specified task UUIDs.
+        """
+        _filter = filter_by_uuids(
+            ['nope',
+             'cdeb220d-7605-4d5f-8341-1a170222e308',
+             'f3a32bb3-ea6b-457c-aa99-08a3d0491ab4'])
+        self.assertThat(
+            [_filter(message_task), _filter(action_task)],
+            Equals([True, True]))
+
+
+class RequiredLiteralTests(TestCase):
+    """
+    Tests for ``eliottree.filter._required_literal``.
+    """
+    def test_literal(self):
+        """
+        The longest run of literal characters, that JSON does not escape,
+        outside of any group and not made optional by a quantifier is found.
+        """
+        for pattern, literal in [
+                (u'/api/v1/users', u'users'),
+                (u'^/api/v\\d+/users\\?id=', u'users?id='),
+                (u'abc*def', u'def'),
+                (u'abcd+e', u'abcd'),
+                (u'(foo)bar', u'bar'),
+                (u'foo(bar)?z', u'foo'),
+                (u'[^]abc]xyz', u'xyz'),
+                (u'[a\\]bcd]qq', u'qq'),
+                (u'say "hello"', u'hello'),
+                (u'caf\xe9s', u'caf'),
+                (u'\\x41BC', u'BC'),
+                (u'\\u0041BCD', u'BCD'),
+                (u'\\U00000041BC', u'BC'),
+                (u'\\N{LATIN SMALL LETTER A}bc', u'bc'),
+                (u'x\\0101yz', u'yz'),
+                (u'(ab)\\1cd', u'cd'),
+                (u'ab{2,3}', u'a'),
+                (u'abc{1,}de', u'ab'),
+                (u'xyz{,4}', u'xy'),
+                (u'(xy){2}zz', u'zz'),
+                (u'ab{x', u'ab')]:
+            self.assertThat(
+                (pattern, _required_literal(re.compile(pattern))),
+                Equals((pattern, literal)))
+
+    def test_unsure(self):
+        """
+        No literal is found for alternations, case-insensitive or verbose
+        patterns, or patterns without any required literal characters.
+        """
+        for pattern in [u'a|b', u'(?i)abc', u'(?x)abc', u'.*', u'(abc)',
+                        u'a?', u'\\d+', u'a{10}', u'\\0101', u'(a)\\1',
+                        u'\\x41', u'\\N{LATIN SMALL LETTER A}']:
+            self.assertThat(
+                (pattern, _required_literal(re.compile(pattern))),
+                Equals((pattern, None)))
+
+
+    def test_line_filter_matches(self):
+        """
+        Lines with field values that match patterns with escapes taking
+        arguments and repetitions are never rejected by the line filter.
+        """
+        for value, pattern in [
+                (u'a' * 10, u'a{10}'),
+                (u'abbb', u'ab{2,3}'),
+                (u'ABC', u'\\x41BC'),
+                (u'abc', u'\\N{LATIN SMALL LETTER A}bc'),
+                (u'A', u'\\0101'),
+                (u'aa', u'(a)\\1')]:
+            f = filter_by_field_regex(u'uri', pattern)
+            line = json.dumps({u'uri': value})
+            line_filter = getattr(f, 'line_filter', lambda line: True)
+            self.assertThat(
+                (pattern, line_filter(line)), Equals((pattern, True)))
+
+
+class FilterByFieldRegex(TestCase):
+    """
+    Tests for ``eliottree.filter_by_field_regex``.
+    """
+    task = dict(
+        message_task,
+        uri=u'/api/v1/users?id=\N{SNOWMAN}',
+        request={u'method': u'GET', u'status': 404})
+
+    def test_match(self):
+        """
+        Return ``True`` if the field value is text matching the regular
+        expression, non-text values never match.
+        """
+        for field, pattern, result in [
+                (u'uri', u'^/api/v\\d+/users', True),
+                (u'uri', u'^/users', False),
+                (u'uri', u'id=\N{SNOWMAN}$', True),
+                (u'request.method', u'^GET$', True),
+                (u'request.status', u'^4\\d\\d$', False),
+                (u'request', u'"method"', False),
+                (u'error', u'false', False),
+                (u'nope', u'.*', False),
+                (u'request.nope', u'.*', False)]:
+            self.assertThat(
+                (field, pattern,
+                 filter_by_field_regex(field, pattern)(self.task)),
+                Equals((field, pattern, result)))
+
+    def test_line_filter(self):
+        """
+        The line filter is a necessary condition for a match, tested against
+        the raw JSON line.
+        """
+        line = dump_json_bytes(self.task).decode('utf-8')
+        _filter = filter_by_field_regex(u'uri', u'^/api/v\\d+/users\\?')
+        self.assertThat(_filter.line_filter(line), Equals(True))
+        self.assertThat(
+            _filter.line_filter(
+                dump_json_bytes(message_task).decode('utf-8')),
+            Equals(False))
+        for pattern in [u'id=\N{SNOWMAN}', u'/v1/', u'"x"']:
+            _filter = filter_by_field_regex(u'uri', pattern)
+            if hasattr(_filter, 'line_filter'):
+                self.assertThat(
+                    _filter.line_filter(
+                        dump_json_bytes(dict(
+                            self.task,
+                            uri=u'/v1/"x"id=\N{SNOWMAN}')).decode('utf-8')),
+                    Equals(True))
+
+
+    def test_line_filter_non_text(self):
+        """
+        Non-text values, whose representation in the log line may differ from
+        any re-encoding, never match, so lines the line filter rejects never
+        contain a match.
+        """
+        for line, field, pattern in [
+                (u'{"status": 1e3}', u'status', u'^1000\\.0$'),
+                (u'{"a":12345}', u'a', u'12345'),
+                (u'{"req":{"a":12345}}', u'req', u'"a": 12345')]:
+            _filter = filter_by_field_regex(field, pattern)
+            self.assertThat(
+                (line, _filter(json.loads(line))),
+                Equals((line, False)))
+
+
 class FilterByStartDate(TestCase):
     """
     Tests for ``eliottree.filter_by_start_date``.
@@ -138,3 +443,411 @@ class FilterByEndDate(TestCase):
         self.assertThat(
             filter_by_end_date(now)(task),
             Equals(True))
+
+
+class FilterByDateRange(TestCase):
+    """
+    Tests for ``eliottree.filter_by_date_range``.
+    """
+    start = datetime(2015, 10, 30, 22, 1, 15).replace(tzinfo=UTC)
+    end = datetime(2015, 10, 30, 22, 2, 15).replace(tzinfo=UTC)
+
+    def task_at(self, *a):
+        return dict(
+            message_task,
+            timestamp=timegm(datetime(*a).utctimetuple()))
+
+    def test_range(self):
+        """
+        Return ``True`` if the input task's timestamp is on or after the start
+        date and before the end date.
+        """
+        _filter = filter_by_date_range(self.start, self.end)
+        self.assertThat(
+            [_filter(self.task_at(2015, 10, 30, 22, 1, 0)),
+             _filter(self.task_at(2015, 10, 30, 22, 1, 15)),
+             _filter(self.task_at(2015, 10, 30, 22, 2, 0)),
+             _filter(self.task_at(2015, 10, 30, 22, 2, 15))],
+            Equals([False, True, True, False]))
+
+    def test_fractional(self):
+        """
+        Fractional timestamps are compared precisely.
+        """
+        start = datetime(
+            2015, 10, 30, 22, 1, 15, 500000).replace(tzinfo=UTC)
+        _filter = filter_by_date_range(start, self.end)
+        timestamp = timegm(start.utctimetuple())
+        self.assertThat(
+            [_filter(dict(message_task, timestamp=timestamp + 0.25)),
+             _filter(dict(message_task, timestamp=timestamp + 0.5))],
+            Equals([False, True]))
+
+    def test_open(self):
+        """
+        Either end of the range may be omitted.
+        """
+        task = self.task_at(2015, 10, 30, 22, 1, 0)
+        self.assertThat(
+            [filter_by_date_range()(task),
+             filter_by_date_range(start_date=self.start)(task),
+             filter_by_date_range(end_date=self.end)(task)],
+            Equals([True, False, True]))
+
+
+class CombineFiltersAnd(TestCase):
+    """
+    Tests for ``eliottree.combine_filters_and``.
+    """
+    def recording_filter(self, calls, name, result, cost=None):
+        def _filter(value):
+            calls.append(name)
+            return result(value)
+        if cost is not None:
+            _filter.cost = cost
+        return _filter
+
+    def test_logical_and(self):
+        """
+        Only values that pass every filter pass the combined filter.
+        """
+        is_even = lambda n: n % 2 == 0
+        is_small = lambda n: n < 10
+        self.assertThat(
+            [combine_filters_and()(3),
+             combine_filters_and(is_even)(3),
+             combine_filters_and(is_even, is_small)(4),
+             combine_filters_and(is_even, is_small)(5),
+             combine_filters_and(is_even, is_small)(12)],
+            Equals([True, False, True, False, False]))
+
+    def test_cheapest_first(self):
+        """
+        Filters are evaluated in order of their cost.
+        """
+        calls = []
+        _filter = combine_filters_and(
+            self.recording_filter(calls, 'expensive', bool, cost=50),
+            self.recording_filter(calls, 'unknown', bool),
+            self.recording_filter(calls, 'cheap', bool, cost=1))
+        self.assertThat(_filter(1), Equals(True))
+        self.assertThat(calls, Equals(['cheap', 'unknown', 'expensive']))
+
+    def test_short_circuit(self):
+        """
+        Evaluation stops at the first filter that rejects a value.
+        """
+        calls = []
+        _filter = combine_filters_and(
+            self.recording_filter(calls, 'a', bool, cost=1),
+            self.recording_filter(calls, 'b', bool, cost=2))
+        self.assertThat(_filter(0), Equals(False))
+        self.assertThat(calls, Equals(['a']))
+
+    def test_adaptive(self):
+        """
+        Filters of equal cost are reordered so that the filter rejecting the
+        most values is evaluated first.
+        """
+        calls = []
+        _filter = combine_filters_and(
+            self.recording_filter(calls, 'permissive', lambda n: True),
+            self.recording_filter(calls, 'selective', lambda n: n == 0),
+            reorder_interval=10)
+        for n in range(1, 10):
+            self.assertThat(_filter(n), Equals(False))
+        del calls[:]
+        self.assertThat(_filter(11), Equals(False))
+        self.assertThat(calls, Equals(['selective']))
+        self.assertThat(_filter(0), Equals(True))
+
+
+class FilterBatches(TestCase):
+    """
+    Tests for ``eliottree.filter_batches``.
+    """
+    messages = [
+        dict(message_task, timestamp=1425356700.0 + i, status=status,
+             index=i)
+        for i, status in enumerate([200, 404, None, 500, 200.5, 302])
+    ] + [
+        dict(action_task, status=True),
+        dict(action_task, status=[500]),
+        dict(action_task, timestamp=1425356710),
+    ]
+
+    def assert_same(self, filters, messages=None):
+        """
+        Filtering in batches, of various sizes, selects the same messages as
+        filtering one message at a time.
+        """
+        if messages is None:
+            messages = self.messages
+        expected = list(filter(combine_filters_and(*filters), messages))
+        for batch_size in [1, 2, 4, 100]:
+            self.assertThat(
+                (batch_size,
+                 list(filter_batches(filters, messages, batch_size))),
+                Equals((batch_size, expected)))
+        return expected
+
+    def test_batch_filters(self):
+        """
+        Filters with batch forms select the same messages, in the same order,
+        as when evaluated one message at a time.
+        """
+        start = datetime(2015, 3, 3, 4, 25, 2, tzinfo=UTC)
+        end = datetime(2015, 3, 3, 4, 25, 7, tzinfo=UTC)
+        for filters in [
+                [filter_by_uuid(message_task[u'task_uuid'])],
+                [filter_by_uuids([action_task[u'task_uuid'], u'nope'])],
+                [filter_by_start_date(start)],
+                [filter_by_end_date(end)],
+                [filter_by_date_range(start, end)],
+                [filter_by_jmespath(u'status >= `400`')],
+                [filter_by_jmespath(u'`300` > status')],
+                [filter_by_jmespath(u'action_status == `started`')],
+                [filter_by_jmespath(u'action_status != `started`')]]:
+            self.assertThat(
+                [hasattr(f, 'batch_filter') for f in filters],
+                Equals([True]))
+            self.assert_same(filters)
+
+    def test_combined(self):
+        """
+        Batch filters and filters without batch forms are combined in a
+        logical-AND fashion.
+        """
+        selected = self.assert_same([
+            filter_by_jmespath(u'status >= `200`'),
+            filter_by_start_date(
+                datetime(2015, 3, 3, 4, 25, 1, tzinfo=UTC)),
+            filter_by_jmespath(u'length(message_type) > `0`')])
+        self.assertThat(
+            [message[u'index'] for message in selected],
+            Equals([1, 3, 4, 5]))
+
+    def test_narrowed(self):
+        """
+        Batch filters are evaluated cheapest first, each only over the
+        messages selected by the previous ones.
+        """
+        seen = []
+
+        def batch_filter(name, cost, field, value):
+            def _filter(message):
+                return message.get(field) == value
+
+            def _batch_filter(columns):
+                seen.append((name, len(columns[field])))
+                return [v == value for v in columns[field]]
+            _filter.cost = cost
+            _filter.batch_filter = _batch_filter
+            return _filter
+
+        self.assertThat(
+            [message[u'index'] for message in filter_batches(
+                [batch_filter(u'expensive', 20, u'status', 200),
+                 batch_filter(u'cheap', 1, u'index', 0)],
+                self.messages, 100)],
+            Equals([0]))
+        self.assertThat(seen, Equals([(u'cheap', 9), (u'expensive', 1)]))
+
+    def test_fallback(self):
+        """
+        Columns containing values a batch filter cannot handle are evaluated
+        one message at a time, only for messages not already rejected.
+        """
+        messages = [
+            dict(message_task, status={u'nope': 500}),
+            dict(message_task, status=500),
+            [u'not', u'a', u'dict']]
+        self.assert_same(
+            [filter_by_uuid(message_task[u'task_uuid']),
+             filter_by_jmespath(u'status > `400`')],
+            messages[:2])
+        self.assert_same(
+            [filter_by_jmespath(u'status > `400`')],
+            messages[1:])
+
+    def test_errors(self):
+        """
+        Errors raised by filters evaluated one message at a time are raised by
+        batch filters too.
+        """
+        messages = [message_task, {u'task_uuid': u'nope'}]
+        _filter = filter_by_start_date(
+            datetime(2015, 3, 3, 4, 25, 0, tzinfo=UTC))
+        with ExpectedException(KeyError):
+            list(filter(combine_filters_and(_filter), messages))
+        with ExpectedException(KeyError):
+            list(filter_batches([_filter], messages))
+
+
+class FilterTasksByDuration(TestCase):
+    """
+    Tests for ``eliottree.filter_tasks_by_duration``.
+    """
+    def test_undecided(self):
+        """
+        Tasks whose root action has not ended are undecided, unless they have
+        already taken longer than the maximum duration.
+        """
+        summary = summarize(
+            action_task,
+            dict(action_task, timestamp=1425356810, task_level=[2, 1]))
+        self.assertThat(
+            [filter_tasks_by_duration(min_duration=1)(summary),
+             filter_tasks_by_duration(max_duration=20)(summary),
+             filter_tasks_by_duration(max_duration=5)(summary)],
+            Equals([None, None, False]))
+
+    def test_range(self):
+        """
+        Tasks whose root action's duration is within the range are selected.
+        """
+        # The root action takes 2 seconds.
+        summary = summarize(action_task, action_task_end)
+        self.assertThat(
+            [filter_tasks_by_duration()(summary),
+             filter_tasks_by_duration(min_duration=2)(summary),
+             filter_tasks_by_duration(min_duration=2.5)(summary),
+             filter_tasks_by_duration(max_duration=2)(summary),
+             filter_tasks_by_duration(max_duration=1.5)(summary),
+             filter_tasks_by_duration(1, 3)(summary)],
+            Equals([True, True, False, True, False, True]))
+
+
+class FilterTasksFailed(TestCase):
+    """
+    Tests for ``eliottree.filter_tasks_failed``.
+    """
+    def test_failed(self):
+        """
+        Tasks are selected as soon as any action fails.
+        """
+        nested_failed = dict(
+            nested_action_task, action_status=u'failed', task_level=[1, 2])
+        self.assertThat(
+            [filter_tasks_failed()(
+                summarize(action_task, action_task_end_failed)),
+             filter_tasks_failed()(
+                 summarize(action_task, nested_failed))],
+            Equals([True, True]))
+
+    def test_succeeded(self):
+        """
+        Tasks are rejected once their root action ends without any failure,
+        and are undecided until then.
+        """
+        self.assertThat(
+            [filter_tasks_failed()(summarize(action_task)),
+             filter_tasks_failed()(
+                 summarize(action_task, action_task_end))],
+            Equals([None, False]))
+
+
+class CombineTaskFiltersAnd(TestCase):
+    """
+    Tests for ``eliottree.combine_task_filters_and``.
+    """
+    def test_verdicts(self):
+        """
+        Any rejection rejects the task, any undecided filter leaves the task
+        undecided, otherwise the task is kept.
+        """
+        def const(verdict):
+            return lambda summary: verdict
+        summary = TaskSummary()
+        self.assertThat(
+            [combine_task_filters_and(const(True), const(True))(summary),
+             combine_task_filters_and(const(True), const(None))(summary),
+             combine_task_filters_and(const(None), const(False))(summary),
+             combine_task_filters_and(const(None))(summary)],
+            Equals([True, None, False, None]))
+
+
+class FilterTasksByExpression(TestCase):
+    """
+    Tests for ``eliottree.filter_tasks_by_expression``.
+    """
+    messages = [
+        message_task,
+        action_task,
+        dict(action_task_end_failed, uri=u'/x'),
+        dict(action_task, task_uuid=u'fast'),
+        dict(action_task_end, task_uuid=u'fast', timestamp=1425356800.5)]
+
+    def select(self, expression):
+        return [
+            task.root().task_uuid
+            for task in tasks_from_iterable(
+                self.messages,
+                task_filter=filter_tasks_by_expression(expression))]
+
+    def test_predicates(self):
+        """
+        Tasks are selected by UUID, status, time, duration and JMESPath
+        predicates.
+        """
+        action_uuid = action_task[u'task_uuid']
+        self.assertThat(
+            [self.select(u'uuid:fast'),
+             self.select(u'uuid!=fast'),
+             self.select(u'status:failed'),
+             self.select(u'start:2015-03-03T04:26:42Z'),
+             self.select(u'end:2015-03-03T04:26:00Z'),
+             self.select(u'duration>1'),
+             self.select(u'duration<=1'),
+             self.select(u"select:'uri'")],
+            Equals([
+                [u'fast'],
+                [message_task[u'task_uuid'], action_uuid],
+                [action_uuid],
+                [action_uuid],
+                [message_task[u'task_uuid']],
+                [action_uuid],
+                [u'fast'],
+                [action_uuid]]))
+
+    def test_boolean(self):
+        """
+        Predicates can be combined with ``and``, ``or`` and ``not``.
+        """
+        self.assertThat(
+            [self.select(u'uuid:fast or status:failed'),
+             self.select(u'not status:failed and duration<10'),
+             self.select(u'not (uuid:fast or duration>0)')],
+            Equals([
+                [action_task[u'task_uuid'], u'fast'],
+                [u'fast'],
+                [message_task[u'task_uuid']]]))
+
+    def test_early(self):
+        """
+        Tasks are rejected as soon as the expression is known to be false.
+        """
+        summary = summarize(action_task)
+        self.assertThat(
+            [filter_tasks_by_expression(u'uuid:fast')(summary),
+             filter_tasks_by_expression(u'uuid:fast or status:failed')(
+                 summary)],
+            Equals([False, None]))
+
+    def test_shared(self):
+        """
+        Identical subexpressions are compiled once, so each message predicate
+        is only evaluated once per message.
+        """
+        _filter = filter_tasks_by_expression(
+            u"select:'uri' or (uuid:fast and select:'uri') or status:failed")
+        self.assertThat(_filter.message_predicates, HasLength(2))
+
+    def test_invalid(self):
+        """
+        Unknown predicates, invalid operators and invalid values are errors.
+        """
+        for expression in [u'nope:1', u'uuid>1', u'duration<soon',
+                           u'start:yesterday', u"select:'a =='"]:
+            with ExpectedException(FilterExpressionError):
+                filter_tasks_by_expression(expression)
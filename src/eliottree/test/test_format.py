@@ -1,4 +1,7 @@
 import time
+from datetime import datetime
+
+from six import text_type
 from testtools import TestCase
 from testtools.matchers import Is
 
@@ -6,6 +9,68 @@ from eliottree import format
 from eliottree.test.matchers import ExactlyEquals
 
 
+class EscapeControlCharactersTests(TestCase):
+    """
+    Tests for `eliottree.format.escape_control_characters` and
+    `eliottree.format.control_character_escaper`.
+    """
+    def test_no_control_characters(self):
+        """
+        Text without control characters is returned unchanged.
+        """
+        self.assertThat(
+            format.escape_control_characters(u'hello \N{SNOWMAN}'),
+            ExactlyEquals(u'hello \N{SNOWMAN}'))
+
+    def test_not_text(self):
+        """
+        Values that are not text are converted to text.
+        """
+        self.assertThat(
+            format.escape_control_characters(42),
+            ExactlyEquals(u'42'))
+
+    def test_control_characters(self):
+        """
+        Control characters are replaced with their Unicode control character
+        equivalents.
+        """
+        self.assertThat(
+            format.escape_control_characters(u'a\x1b[0m\tb\nc\x7f'),
+            ExactlyEquals(u'a\u241b[0m\u2409b\u240ac\u2421'))
+
+    def test_overrides(self):
+        """
+        Overrides replace the default replacements, or remove the need for
+        any replacement.
+        """
+        self.assertThat(
+            format.escape_control_characters(
+                u'a\nb\tc', overrides={0x0a: u'\n', 0x09: u' '}),
+            ExactlyEquals(u'a\nb c'))
+        self.assertThat(
+            format.escape_control_characters(
+                u'a\nb', overrides={0x0a: u'\n'}),
+            ExactlyEquals(u'a\nb'))
+        self.assertThat(
+            format.escape_control_characters(u'a\nb'),
+            ExactlyEquals(u'a\u240ab'))
+
+    def test_escaper(self):
+        """
+        `control_character_escaper` produces an escaper equivalent to
+        `escape_control_characters`, also for overrides of other characters.
+        """
+        escape = format.control_character_escaper(
+            overrides={0x0a: u'\n', ord(u'x'): u'y', 0x09: None})
+        self.assertThat(
+            escape(u'x\n\t\x00'),
+            ExactlyEquals(u'y\n\u2400'))
+        self.assertThat(
+            escape(u'abc'),
+            ExactlyEquals(u'abc'))
+
+
 class BinaryTests(TestCase):
     """
     Tests for `eliottree.format.binary`.
@@ -110,6 +175,145 @@ class TimestampTests(TestCase):
         # Strip the "Z" off the end.
         self.assertThat(utc[:-1], ExactlyEquals(local))
 
+    def test_cached_seconds(self):
+        """
+        Timestamps formatted without microseconds, from the cache, are the
+        same as those formatted by `datetime`, in UTC and local time.
+        """
+        for utc_timestamps in [True, False]:
+            _format = format.timestamp(
+                include_microsecond=False, utc_timestamps=utc_timestamps)
+            from_timestamp = (
+                datetime.utcfromtimestamp
+                if utc_timestamps else datetime.fromtimestamp)
+            for value in [1433631432, 1433631432.0, 1433631432.5,
+                          1433631432.9999994, 1433631432.9999996,
+                          u'1433631432.25', 0, -1.5, -0.0000001,
+                          1490497200.5, 1509238800.5]:
+                expected = from_timestamp(float(value)).replace(
+                    microsecond=0).isoformat(' ')
+                if utc_timestamps:
+                    expected += u'Z'
+                self.assertThat(
+                    (value, _format(value)),
+                    ExactlyEquals((value, expected)))
+
+    def test_cache(self):
+        """
+        Timestamps within the same second are formatted once.
+        """
+        _format = format.timestamp(include_microsecond=False)
+        format._format_seconds.cache_clear()
+        for value in [1433631432.1, 1433631432.2, 1433631432.3]:
+            _format(value)
+        info = format._format_seconds.cache_info()
+        self.assertThat(
+            (info.hits, info.misses),
+            ExactlyEquals((2, 1)))
+
+
+class DispatchTests(TestCase):
+    """
+    Tests for `eliottree.format.dispatch`.
+    """
+    def test_equivalent(self):
+        """
+        Values are formatted the same as with a chain of `some` formatters.
+        """
+        class _Text(text_type):
+            pass
+
+        mapping = {
+            u'upper': lambda value, field_name: value.upper(),
+            u'none': lambda value, field_name: None}
+        expected = format.some(
+            format.fields(mapping),
+            format.text(),
+            format.binary('utf-8'),
+            format.anything('utf-8'))
+        _format = format.dispatch('utf-8', mapping)
+        for value, field_name in [
+                (u'\N{SNOWMAN}', None),
+                (_Text(u'hello'), None),
+                (u'\N{SNOWMAN}'.encode('utf-8'), None),
+                (b'\xff', u'field'),
+                (42, None),
+                (4.2, None),
+                (None, None),
+                (True, None),
+                ([1, u'2'], None),
+                (u'hello', u'upper'),
+                (u'hello', u'none'),
+                (42, u'none')]:
+            self.assertThat(
+                _format(value, field_name),
+                ExactlyEquals(expected(value, field_name)))
+
+
+class BoundedReprTests(TestCase):
+    """
+    Tests for `eliottree.format.bounded_repr`.
+    """
+    def values(self):
+        class _List(list):
+            def __repr__(self):
+                return u'<custom list>'
+
+        class _Multiline(object):
+            def __repr__(self):
+                return u'<multiline\nobject>'
+
+        recursive_list = [1, 2]
+        recursive_list.append(recursive_list)
+        recursive_dict = {u'a': 1}
+        recursive_dict[u'b'] = recursive_dict
+        return [
+            42, 4.5, None, True, u'\N{SNOWMAN}', b'bytes',
+            [], (), {}, (1,), (1, 2), [1, [2, [3, (4,)]], {}],
+            {u'a': [1, 2, {u'b': None}], u'c': (u'd',), 1: u'\N{SNOWMAN}'},
+            [u'it\'s', u'"quoted"', u'new\nline'],
+            _List([1, 2]), [_List([1]), 2], [_Multiline(), 2],
+            recursive_list, recursive_dict]
+
+    def test_complete(self):
+        """
+        Values whose `repr` fits within the limit are represented exactly as
+        `repr` does.
+        """
+        _repr = format.anything('utf-8')
+        for value in self.values():
+            if u'\n' in _repr(value):
+                # Stops at the first newline.
+                continue
+            self.assertThat(
+                format.bounded_repr(value, 10000),
+                ExactlyEquals(_repr(value)))
+
+    def test_truncated(self):
+        """
+        Truncating the bounded `repr` gives the same result as truncating the
+        complete `repr`.
+        """
+        _repr = format.anything('utf-8')
+        for value in self.values():
+            for limit in range(1, 40):
+                self.assertThat(
+                    (value, limit,
+                     format.truncate_value(
+                         limit, format.bounded_repr(value, limit))),
+                    ExactlyEquals(
+                        (value, limit,
+                         format.truncate_value(limit, _repr(value)))))
+
+    def test_bounded(self):
+        """
+        Only enough of the `repr` to exceed the limit is produced.
+        """
+        value = [{u'index': i} for i in range(100000)]
+        self.assertThat(
+            len(format.bounded_repr(value, 20)) < 40,
+            Is(True))
+
 
 class AnythingTests(TestCase):
     """
@@ -167,3 +371,32 @@ class TruncateTests(TestCase):
         self.assertThat(
             format.truncate_value(10, u'abc\ndef'),
             ExactlyEquals(u'abc\u2026'))
+
+    def test_newline_after_limit(self):
+        """
+        Newlines beyond the limit do not affect truncation.
+        """
+        self.assertThat(
+            format.truncate_value(3, u'abcdef\nghi'),
+            ExactlyEquals(u'abc\u2026'))
+        self.assertThat(
+            format.truncate_value(3, u'abc\ndef'),
+            ExactlyEquals(u'abc\u2026'))
+
+    def test_equivalent(self):
+        """
+        Truncation is the same as truncating the first line of the value.
+        """
+        def _truncate(limit, value):
+            values = value.split(u'\n')
+            value = values[0]
+            if len(value) > limit or len(values) > 1:
+                return u'{}\u2026'.format(value[:limit])
+            return value
+
+        for value in [u'', u'\n', u'a\n', u'\nb', u'ab\ncd\nef',
+                      u'\N{SNOWMAN}' * 5, u'abc\n\N{SNOWMAN}' * 3]:
+            for limit in range(1, 12):
+                self.assertThat(
+                    format.truncate_value(limit, value),
+                    ExactlyEquals(_truncate(limit, value)))
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+
+from testtools import TestCase
+from testtools.matchers import Equals, Is, Not
+
+from eliottree._compat import dump_json_bytes
+from eliottree._index import (
+    BloomFilter, build_index, index_path, indexed_lines, read_index)
+from eliottree.test.tasks import action_task, message_task
+
+
+class BloomFilterTests(TestCase):
+    """
+    Tests for `eliottree._index.BloomFilter`.
+    """
+    def test_no_false_negatives(self):
+        """
+        Every item added to the filter is reported as present.
+        """
+        items = [u'item-{}'.format(i) for i in range(1000)]
+        bloom = BloomFilter.for_capacity(len(items))
+        for item in items:
+            bloom.add(item)
+        self.assertThat(
+            all(item in bloom for item in items),
+            Equals(True))
+
+    def test_absent(self):
+        """
+        Items not added to the filter are mostly reported as absent.
+        """
+        bloom = BloomFilter.for_capacity(100, error_rate=0.01)
+        for i in range(100):
+            bloom.add(u'present-{}'.format(i))
+        false_positives = sum(
+            u'absent-{}'.format(i) in bloom for i in range(1000))
+        self.assertThat(false_positives < 50, Equals(True))
+
+    def test_json(self):
+        """
+        Filters round-trip through their JSON representation.
+        """
+        bloom = BloomFilter.for_capacity(10)
+        bloom.add(u'\N{SNOWMAN}')
+        bloom = BloomFilter.from_json(bloom.to_json())
+        self.assertThat(u'\N{SNOWMAN}' in bloom, Equals(True))
+        self.assertThat(u'nope' in bloom, Equals(False))
+
+
+class IndexTests(TestCase):
+    """
+    Tests for `eliottree._index.build_index` and related functions.
+    """
+    def setUp(self):
+        super(IndexTests, self).setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.path = os.path.join(path, 'eliot.log')
+        self.messages = (
+            [dict(message_task, index=i) for i in range(3)]
+            + [dict(action_task, index=i) for i in range(3)])
+        with open(self.path, 'wb') as fd:
+            for message in self.messages:
+                fd.write(dump_json_bytes(message) + b'\n')
+
+    def lines(self, constraints):
+        return [
+            (line_number, line)
+            for line_number, line in indexed_lines(
+                self.path, read_index(self.path), constraints)]
+
+    def test_no_index(self):
+        """
+        Files without an index have no index to read.
+        """
+        self.assertThat(read_index(self.path), Is(None))
+
+    def test_stale(self):
+        """
+        An index is ignored once the file it summarizes changes.
+        """
+        build_index(self.path)
+        self.assertThat(read_index(self.path), Not(Is(None)))
+        with open(self.path, 'ab') as fd:
+            fd.write(dump_json_bytes(message_task) + b'\n')
+        self.assertThat(read_index(self.path), Is(None))
+
+    def test_skip_regions(self):
+        """
+        Only regions that may contain messages matching the constraints are
+        read, with their original line numbers.
+        """
+        size = len(dump_json_bytes(self.messages[0])) * 3
+        self.assertThat(
+            build_index(self.path, region_size=size),
+            Equals(index_path(self.path)))
+        with open(self.path) as fd:
+            all_lines = list(enumerate(fd, 1))
+        self.assertThat(self.lines({}), Equals(all_lines))
+        self.assertThat(
+            self.lines({u'task_uuid': {action_task[u'task_uuid']}}),
+            Equals(all_lines[3:]))
+        self.assertThat(
+            self.lines({u'action_type': {u'app:action'},
+                        u'task_uuid': {message_task[u'task_uuid']}}),
+            Equals([]))
+        self.assertThat(
+            self.lines({u'task_uuid': {u'nope', message_task[u'task_uuid']}}),
+            Equals(all_lines[:3]))
+
+    def test_malformed(self):
+        """
+        Regions containing malformed messages are always read, so that the
+        parser can report the error.
+        """
+        with open(self.path, 'ab') as fd:
+            fd.write(b'not JSON\n')
+        build_index(self.path, region_size=1)
+        self.assertThat(
+            self.lines({u'task_uuid': {u'nope'}}),
+            Equals([(7, u'not JSON\n')]))
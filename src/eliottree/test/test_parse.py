@@ -0,0 +1,251 @@
+from testtools import TestCase
+from testtools.matchers import Equals, HasLength, Is
+
+from eliottree import group_tasks_by_shape, tasks_from_iterable
+from eliottree._parse import message_shape
+from eliottree.test.tasks import (
+    action_task, action_task_end, action_task_end_failed, message_task,
+    nested_action_task, summarize)
+
+
+def _retimed(messages, task_uuid, offset, scale=1):
+    """
+    Copy ``messages`` with a different task UUID and shifted and scaled
+    timestamps.
+    """
+    return [
+        dict(message,
+             task_uuid=task_uuid,
+             timestamp=offset + message[u'timestamp'] * scale)
+        for message in messages]
+
+
+class TaskSummaryTests(TestCase):
+    """
+    Tests for `eliottree._parse.TaskSummary`.
+    """
+    def test_empty(self):
+        """
+        An empty summary has no duration or span.
+        """
+        summary = summarize()
+        self.assertThat(summary.duration, Is(None))
+        self.assertThat(summary.span, Equals(0))
+        self.assertThat(summary.failed, Equals(False))
+
+    def test_incomplete(self):
+        """
+        The span of an incomplete task covers the messages seen so far, but the
+        duration is unknown.
+        """
+        summary = summarize(nested_action_task, action_task)
+        self.assertThat(summary.duration, Is(None))
+        self.assertThat(summary.span, Equals(100))
+        self.assertThat(summary.root_start, Equals(1425356800))
+
+    def test_complete(self):
+        """
+        The duration and status of the root action are known once it ends.
+        """
+        summary = summarize(action_task, action_task_end_failed)
+        self.assertThat(summary.duration, Equals(4))
+        self.assertThat(summary.root_status, Equals(u'failed'))
+        self.assertThat(summary.failed, Equals(True))
+
+    def test_message(self):
+        """
+        Tasks without a root action have no duration.
+        """
+        summary = summarize(message_task)
+        self.assertThat(summary.duration, Is(None))
+
+
+class TasksFromIterableTests(TestCase):
+    """
+    Tests for `eliottree.tasks_from_iterable`.
+    """
+    def test_tasks(self):
+        """
+        Complete tasks are produced as they complete, followed by any
+        incomplete tasks.
+        """
+        tasks = list(tasks_from_iterable(
+            [action_task, message_task, action_task_end]))
+        self.assertThat(
+            [task.root().task_uuid for task in tasks],
+            Equals([message_task[u'task_uuid'], action_task[u'task_uuid']]))
+
+    def test_task_filter(self):
+        """
+        Only tasks that the task filter keeps are produced, undecided tasks are
+        discarded.
+        """
+        def task_filter(summary):
+            if summary.root_status is None:
+                return None
+            return summary.root_status == u'succeeded'
+        self.assertThat(
+            list(tasks_from_iterable(
+                [action_task, action_task_end], task_filter=task_filter)),
+            HasLength(1))
+        self.assertThat(
+            list(tasks_from_iterable(
+                [action_task, action_task_end_failed],
+                task_filter=task_filter)),
+            HasLength(0))
+        self.assertThat(
+            list(tasks_from_iterable(
+                [message_task, action_task], task_filter=task_filter)),
+            HasLength(0))
+
+    def test_task_filter_discard(self):
+        """
+        Once a task is rejected, further messages for it are not seen by the
+        task filter.
+        """
+        seen = []
+
+        def task_filter(summary):
+            seen.append(summary.last_timestamp)
+            return False
+        self.assertThat(
+            list(tasks_from_iterable(
+                [action_task, nested_action_task, action_task_end],
+                task_filter=task_filter)),
+            Equals([]))
+        self.assertThat(seen, Equals([action_task[u'timestamp']]))
+
+    def test_task_filter_forget(self):
+        """
+        Rejected tasks are only remembered, in order to ignore their further
+        messages, until the task ends.
+        """
+        seen = []
+
+        def reject(summary):
+            seen.append(summary.last_timestamp)
+            return False
+
+        def reject_finished(summary):
+            seen.append(summary.last_timestamp)
+            return None if summary.root_status is None else False
+
+        for task_filter, expected in [
+                (reject, [1425356800, 1425356800]),
+                (reject_finished,
+                 [1425356800, 1425356802, 1425356800, 1425356800])]:
+            del seen[:]
+            self.assertThat(
+                list(tasks_from_iterable(
+                    [action_task, action_task_end, action_task],
+                    task_filter=task_filter)),
+                Equals([]))
+            self.assertThat(seen, Equals(expected))
+
+    def test_task_shapes(self):
+        """
+        If a ``task_shapes`` mapping is given, the shape of each task is
+        recorded in it before the task is produced.
+        """
+        task_shapes = {}
+        tasks = tasks_from_iterable(
+            [action_task, message_task, action_task_end],
+            task_shapes=task_shapes)
+        task = next(tasks)
+        self.assertThat(
+            task_shapes,
+            Equals({task.root().task_uuid: message_shape(message_task)}))
+        task = next(tasks)
+        self.assertThat(
+            task_shapes[task.root().task_uuid],
+            Equals(message_shape(action_task)
+                   + message_shape(action_task_end)))
+
+    def test_task_shapes_discarded(self):
+        """
+        Shapes are not recorded for tasks the task filter discards.
+        """
+        task_shapes = {}
+        list(tasks_from_iterable(
+            [action_task, action_task_end, message_task],
+            task_filter=lambda summary: summary.root_status is None,
+            task_shapes=task_shapes))
+        self.assertThat(
+            list(task_shapes), Equals([message_task[u'task_uuid']]))
+
+
+class MessageShapeTests(TestCase):
+    """
+    Tests for `eliottree._parse.message_shape`.
+    """
+    def test_ignores_values(self):
+        """
+        Timestamps, task UUIDs and other fields do not affect the shape of a
+        message.
+        """
+        self.assertThat(
+            message_shape(
+                dict(action_task, timestamp=0, task_uuid=u'other', x=1)),
+            Equals(message_shape(action_task)))
+
+    def test_structure(self):
+        """
+        Task levels, types and statuses all affect the shape of a message.
+        """
+        shapes = {
+            message_shape(action_task),
+            message_shape(dict(action_task, task_level=[2])),
+            message_shape(dict(action_task, action_type=u'app:other')),
+            message_shape(dict(action_task, action_status=u'failed')),
+            message_shape(message_task)}
+        self.assertThat(shapes, HasLength(5))
+
+    def test_unhashable(self):
+        """
+        Messages with unhashable task levels still have a shape.
+        """
+        shape = message_shape(dict(action_task, task_level=[[1]]))
+        self.assertThat(
+            shape, Equals(message_shape(dict(action_task, task_level=[[1]]))))
+
+
+class GroupTasksByShapeTests(TestCase):
+    """
+    Tests for `eliottree.group_tasks_by_shape`.
+    """
+    def group(self, messages):
+        task_shapes = {}
+        tasks = tasks_from_iterable(messages, task_shapes=task_shapes)
+        return group_tasks_by_shape(tasks, task_shapes), task_shapes
+
+    def test_groups(self):
+        """
+        Tasks with the same shape are grouped, in the order their shapes were
+        first seen, with the first task as the representative and the
+        durations of the finished tasks.
+        """
+        task = [action_task, nested_action_task, action_task_end]
+        other = _retimed(task, u'other', 100, scale=2)
+        failed = _retimed(
+            [action_task, nested_action_task, action_task_end_failed],
+            u'failed', 0)
+        incomplete = _retimed(task[:1], u'incomplete', 0)
+        groups, task_shapes = self.group(
+            [message_task] + failed + list(reversed(other)) + task
+            + incomplete)
+        self.assertThat(
+            [(group.task.root().task_uuid, group.count) for group in groups],
+            Equals([(message_task[u'task_uuid'], 1),
+                    (u'failed', 1),
+                    (u'other', 2),
+                    (u'incomplete', 1)]))
+        self.assertThat(groups[0].finished, Equals(0))
+        self.assertThat(
+            (groups[2].finished, groups[2].total_duration), Equals((2, 6)))
+        self.assertThat(
+            (groups[2].min_duration,
+             groups[2].mean_duration,
+             groups[2].max_duration),
+            Equals((2, 3, 4)))
+        self.assertThat(groups[3].mean_duration, Is(None))
+        self.assertThat(task_shapes, Equals({}))
@@ -1,26 +1,30 @@
 import time
-from eliot.parse import WrittenMessage
+from eliot.parse import WrittenAction, WrittenMessage
 from six import StringIO, text_type
 from testtools import ExpectedException, TestCase
 from testtools.matchers import AfterPreprocessing as After
 from testtools.matchers import (
-    Contains, Equals, HasLength, MatchesAll, MatchesListwise, StartsWith)
+    Contains, EndsWith, Equals, HasLength, MatchesAll, MatchesListwise,
+    StartsWith)
 
 from eliottree import (
-    render_tasks, tasks_from_iterable)
+    group_tasks_by_shape, render_tasks, tasks_from_iterable)
 from eliottree._color import colored
 from eliottree._render import (
-    _default_value_formatter, format_node,
-    get_children, message_fields, message_name)
+    DEFAULT_IGNORED_KEYS, CollapsedActions, ElidedItems, ElidedNodes, _default_value_formatter,
+    _sorted_keys, format_node,
+    get_children, message_fields, message_name, render_plan)
 from eliottree.tree_format._text import (
     HOURGLASS, RIGHT_DOUBLE_ARROW, Options)
 from eliottree._theme import get_theme
 from eliottree._util import eliot_ns
 from eliottree.test.matchers import ExactlyEquals
 from eliottree.test.tasks import (
-    action_task, action_task_end, action_task_end_failed, dict_action_task,
+    action_task, action_task_end, action_task_end_failed,
+    branching_task_messages, dict_action_task,
     janky_action_task, janky_message_task, list_action_task, message_task,
-    multiline_action_task, nested_action_task)
+    multiline_action_task, nested_action_task, polling_task_messages,
+    unnamed_message)
 
 
 class DefaultValueFormatterTests(TestCase):
@@ -286,6 +290,17 @@ class FormatNodeTests(TestCase):
                 colors.prop_key(u'a\u240ab\u241bc'),
                 colors.prop_value(u''))))
 
+    def test_elided_items(self):
+        """
+        Elided items are rendered as a count.
+        """
+        self.assertThat(
+            self.format_node(ElidedItems(3, more=True), colors=colors),
+            ExactlyEquals(colors.prop_value(u'\u2026 3 more')))
+        self.assertThat(
+            self.format_node(ElidedItems(5, more=False), colors=colors),
+            ExactlyEquals(colors.prop_value(u'\u2026 5 items')))
+
     def test_tuple_other(self):
         """
         Tuples can be a key and string, number, etc. rendered inline.
@@ -352,6 +367,97 @@ class MessageFieldsTests(TestCase):
             message_fields(message, {u'b'}),
             Equals([(u'a', 1)]))
 
+    def test_sorted(self):
+        """
+        Fields are sorted by name. Messages with the same field names, in any
+        order, share the same sorted order.
+        """
+        _sorted_keys.cache_clear()
+        for contents in [{u'c': 3, u'a': 1, u'b': 2, u'f': 4},
+                         {u'f': 4, u'b': 2, u'a': 1, u'c': 3}]:
+            message = WrittenMessage.from_dict(contents)
+            self.assertThat(
+                message_fields(message, {u'c'}),
+                Equals([(u'a', 1), (u'b', 2), (u'f', 4)]))
+        self.assertThat(_sorted_keys.cache_info().hits, Equals(1))
+
+
+class ElidedNodesTests(TestCase):
+    """
+    Tests for `eliottree._render.ElidedNodes`.
+    """
+    def test_summarize(self):
+        """
+        Actions and messages, including nested ones, are counted along with
+        failed actions, and the durations of the outermost actions totalled.
+        """
+        root = next(tasks_from_iterable(branching_task_messages)).root()
+        summary = ElidedNodes.summarize(list(root.children))
+        self.assertThat(
+            (summary.actions, summary.messages, summary.failed,
+             summary.duration),
+            Equals((2, 2, 1, 2.5)))
+        summary = ElidedNodes.summarize(list(root.children)[:1])
+        self.assertThat(
+            (summary.actions, summary.messages, summary.failed,
+             summary.duration),
+            Equals((0, 1, 0, None)))
+
+    def test_format(self):
+        """
+        Summaries are formatted with their counts, failures and duration.
+        """
+        self.assertThat(
+            format_node(
+                _default_value_formatter(human_readable=True, field_limit=0),
+                colors, Options(),
+                ElidedNodes(actions=1, messages=3, failed=1, duration=1.5)),
+            ExactlyEquals(u'{} 1 action, 3 messages ({} failed) {} {}'.format(
+                colors.parent(u'\u2026'),
+                colors.status_failure(u'1'),
+                HOURGLASS,
+                colors.duration(u'1.500s'))))
+
+
+class CollapsedActionsTests(TestCase):
+    """
+    Tests for `eliottree._render.CollapsedActions`.
+    """
+    def test_collapse(self):
+        """
+        Runs of more than one consecutive sibling action with the same action
+        type and status are collapsed, with their duration statistics.
+        """
+        root = next(tasks_from_iterable(polling_task_messages)).root()
+        children = list(
+            get_children(
+                DEFAULT_IGNORED_KEYS, root, collapse_repeated=True))
+        self.assertThat(
+            [type(child) for child in children],
+            Equals([CollapsedActions, WrittenAction, WrittenMessage,
+                    WrittenMessage]))
+        collapsed = children[0]
+        self.assertThat(
+            (collapsed.action_type, collapsed.status, len(collapsed.actions),
+             collapsed.min_duration, collapsed.mean_duration,
+             collapsed.max_duration),
+            Equals((u'app:poll', u'succeeded', 3, 0.5, 1.0, 1.5)))
+        self.assertThat(get_children(set(), collapsed), Equals([]))
+
+    def test_summarize(self):
+        """
+        Collapsed actions are summarized as the actions they collapse.
+        """
+        root = next(tasks_from_iterable(polling_task_messages)).root()
+        children = list(
+            get_children(
+                DEFAULT_IGNORED_KEYS, root, collapse_repeated=True))
+        summary = ElidedNodes.summarize(children[:2])
+        self.assertThat(
+            (summary.actions, summary.messages, summary.failed,
+             summary.duration),
+            Equals((4, 0, 1, 4.0)))
+
 
 class GetChildrenTests(TestCase):
     """
@@ -477,6 +583,47 @@ class GetChildrenTests(TestCase):
                       (1, u'b'),
                       (2, u'c')])))
 
+    def test_max_items(self):
+        """
+        Only the first ``max_items`` items of dicts, by key, and lists are
+        children, followed by a summary of the remainder.
+        """
+        node = (u'key', {u'c': 3, u'a': 1, u'd': 4, u'b': 2})
+        self.assertThat(
+            get_children(set(), node, max_items=2),
+            Equals([(u'a', 1), (u'b', 2), ElidedItems(2, more=True)]))
+        node = (u'key', [u'a', u'b', u'c'])
+        self.assertThat(
+            get_children(set(), node, max_items=2),
+            Equals([(0, u'a'), (1, u'b'), ElidedItems(1, more=True)]))
+        self.assertThat(
+            get_children(set(), node, max_items=3),
+            Equals([(0, u'a'), (1, u'b'), (2, u'c')]))
+
+    def test_max_nesting(self):
+        """
+        Values nested deeper than ``max_nesting`` are summarized.
+        """
+        node = (u'key', {u'a': [1, {u'b': 2}], u'c': {}})
+        self.assertThat(
+            get_children(set(), node, max_nesting=1),
+            Equals([ElidedItems(2, more=False)]))
+        children = get_children(set(), node, max_nesting=2)
+        self.assertThat(
+            children,
+            Equals([(u'a', [1, {u'b': 2}]), (u'c', {})]))
+        self.assertThat(
+            [get_children(set(), child, max_nesting=2)
+             for child in children],
+            Equals([[ElidedItems(2, more=False)], []]))
+        children = get_children(
+            set(), get_children(set(), node, max_nesting=3)[0],
+            max_nesting=3)
+        self.assertThat(
+            [get_children(set(), child, max_nesting=3)
+             for child in children],
+            Equals([[], [ElidedItems(1, more=False)]]))
+
     def test_other(self):
         """
         Other values are considered to have no children.
@@ -547,6 +694,25 @@ class RenderTasksTests(TestCase):
                 u'    \u2514\u2500\u2500 app:action/2 \u21d2 succeeded '
                 u'1425356802\n\n'))
 
+    def test_write_batches(self):
+        """
+        Large tasks are written a batch of lines at a time, rather than as a
+        single string.
+        """
+        writes = []
+        task = dict(message_task, **{
+            u'field{:04d}'.format(i): i for i in range(1000)})
+        render_tasks(
+            write=writes.append,
+            tasks=tasks_from_iterable([task]))
+        self.assertThat(len(writes) > 2, Equals(True))
+        self.assertThat(
+            u''.join(writes),
+            ExactlyEquals(self.render_tasks([task])))
+        self.assertThat(
+            writes[-2],
+            EndsWith(u'\u2514\u2500\u2500 message: Main loop terminated.\n'))
+
     def test_tasks_human_readable(self):
         """
         Render two tasks of sequential levels, by default most standard Eliot
@@ -663,6 +829,134 @@ class RenderTasksTests(TestCase):
                 u'        \u251c\u2500\u2500 0: a\n'
                 u'        \u2514\u2500\u2500 1: b\n\n'))
 
+    def test_collapse_repeated(self):
+        """
+        Consecutive sibling actions with the same action type and status are
+        rendered as a single node.
+        """
+        self.assertThat(
+            self.render_tasks(polling_task_messages, collapse_repeated=True),
+            ExactlyEquals(
+                u'0d5b7af1-09e1-4a4b-9c33-0b3e3c9a1c5e\n'
+                u'\u2514\u2500\u2500 app:root/1 \u21d2 started 10 '
+                u'\u29d6 11\n'
+                u'    \u251c\u2500\u2500 app:poll \xd7 3 \u21d2 succeeded 11 '
+                u'\u29d6 min 0.5, avg 1.0, max 1.5\n'
+                u'    \u251c\u2500\u2500 app:poll/5/1 \u21d2 started 14 '
+                u'\u29d6 1\n'
+                u'    \u2502   \u2514\u2500\u2500 app:poll/5/2 \u21d2 '
+                u'failed 15\n'
+                u'    \u251c\u2500\u2500 app:log/6 20\n'
+                u'    \u2514\u2500\u2500 app:root/7 \u21d2 succeeded 21\n'
+                u'\n'))
+
+    def test_group_shapes(self):
+        """
+        `TaskShape` groups render as the representative task, with the number
+        of tasks of that shape and their durations.
+        """
+        fd = StringIO()
+        task_shapes = {}
+        other = [
+            dict(message,
+                 task_uuid=u'other',
+                 timestamp=message[u'timestamp'] + 1)
+            for message in [action_task, action_task_end_failed]]
+        tasks = tasks_from_iterable(
+            [action_task, action_task_end] + other, task_shapes=task_shapes)
+        render_tasks(
+            write=fd.write,
+            tasks=group_tasks_by_shape(tasks, task_shapes))
+        self.assertThat(
+            fd.getvalue(),
+            ExactlyEquals(
+                u'f3a32bb3-ea6b-457c-aa99-08a3d0491ab4 \xd7 1 '
+                u'\u29d6 min 2, avg 2.0, max 2\n'
+                u'\u2514\u2500\u2500 app:action/1 \u21d2 started '
+                u'1425356800 \u29d6 2\n'
+                u'    \u2514\u2500\u2500 app:action/2 \u21d2 succeeded '
+                u'1425356802\n\n'
+                u'other \xd7 1 \u29d6 min 4, avg 4.0, max 4\n'
+                u'\u2514\u2500\u2500 app:action/1 \u21d2 started '
+                u'1425356801 \u29d6 4\n'
+                u'    \u2514\u2500\u2500 app:action/2 \u21d2 failed '
+                u'1425356805\n\n'))
+
+    def test_max_children(self):
+        """
+        Only ``max_children`` children of each action are rendered, the
+        remainder are summarized.
+        """
+        self.assertThat(
+            self.render_tasks(branching_task_messages, max_children=1),
+            ExactlyEquals(
+                u'0d5b7af1-09e1-4a4b-9c33-0b3e3c9a1c5e\n'
+                u'\u2514\u2500\u2500 app:root/1 \u21d2 started 10 '
+                u'\u29d6 10\n'
+                u'    \u251c\u2500\u2500 app:log/2 11\n'
+                u'    \u251c\u2500\u2500 \u2026 2 actions, 1 message '
+                u'(1 failed) \u29d6 2.5\n'
+                u'    \u2514\u2500\u2500 app:root/5 \u21d2 succeeded 20\n'
+                u'\n'))
+
+    def test_max_depth(self):
+        """
+        Children of actions deeper than ``max_depth`` are summarized.
+        """
+        self.assertThat(
+            self.render_tasks(branching_task_messages, max_depth=2),
+            ExactlyEquals(
+                u'0d5b7af1-09e1-4a4b-9c33-0b3e3c9a1c5e\n'
+                u'\u2514\u2500\u2500 app:root/1 \u21d2 started 10 '
+                u'\u29d6 10\n'
+                u'    \u251c\u2500\u2500 app:log/2 11\n'
+                u'    \u251c\u2500\u2500 app:child/3/1 \u21d2 started 12 '
+                u'\u29d6 1\n'
+                u'    \u2502   \u251c\u2500\u2500 \u2026 1 message\n'
+                u'    \u2502   \u2514\u2500\u2500 app:child/3/3 \u21d2 '
+                u'failed 13\n'
+                u'    \u2502       \u251c\u2500\u2500 exception: '
+                u'ValueError\n'
+                u'    \u2502       \u2514\u2500\u2500 reason: nope\n'
+                u'    \u251c\u2500\u2500 app:child/4/1 \u21d2 started 13 '
+                u'\u29d6 1.5\n'
+                u'    \u2502   \u2514\u2500\u2500 app:child/4/2 \u21d2 '
+                u'succeeded 14.5\n'
+                u'    \u2514\u2500\u2500 app:root/5 \u21d2 succeeded 20\n'
+                u'\n'))
+        self.assertThat(
+            self.render_tasks(branching_task_messages, max_depth=1),
+            Contains(
+                u'    \u251c\u2500\u2500 \u2026 2 actions, 2 messages '
+                u'(1 failed) \u29d6 2.5\n'))
+
+    def test_max_items(self):
+        """
+        Nested values are rendered up to ``max_items`` items.
+        """
+        self.assertThat(
+            self.render_tasks([list_action_task], max_items=1),
+            ExactlyEquals(
+                u'f3a32bb3-ea6b-457c-aa99-08a3d0491ab4\n'
+                u'\u2514\u2500\u2500 app:action/1 \u21d2 started '
+                u'1425356800\n'
+                u'    \u2514\u2500\u2500 some_data: \n'
+                u'        \u251c\u2500\u2500 0: a\n'
+                u'        \u2514\u2500\u2500 \u2026 1 more\n\n'))
+
+    def test_max_nesting(self):
+        """
+        Nested values are rendered up to ``max_nesting`` levels deep.
+        """
+        self.assertThat(
+            self.render_tasks([dict_action_task], max_nesting=1),
+            ExactlyEquals(
+                u'f3a32bb3-ea6b-457c-aa99-08a3d0491ab4\n'
+                u'\u2514\u2500\u2500 app:action/1 \u21d2 started '
+                u'1425356800\n'
+                u'    \u2514\u2500\u2500 some_data: \n'
+                u'        \u2514\u2500\u2500 \u2026 1 item\n\n'))
+
     def test_nested(self):
         """
         Render nested tasks in a way that visually represents that nesting.
@@ -731,3 +1025,80 @@ class RenderTasksTests(TestCase):
                         colors.timestamp(u'1425356802')),
                     u'\n',
                 ])))
+
+
+class RenderPlanTests(TestCase):
+    """
+    Tests for `eliottree._render.render_plan`.
+    """
+    tasks = [
+        [message_task],
+        [unnamed_message],
+        [action_task, action_task_end],
+        [action_task, nested_action_task, action_task_end_failed],
+        [dict_action_task, action_task_end],
+        [list_action_task, action_task_end],
+        [multiline_action_task],
+        [janky_action_task],
+        [janky_message_task],
+        [dict(message_task, data={u'a': [1, {u'b': 2}], u'c': u'd'})],
+        branching_task_messages,
+        polling_task_messages,
+    ]
+
+    def render(self, messages, **kw):
+        fd = StringIO()
+        err = StringIO()
+        render_tasks(
+            write=fd.write,
+            write_err=err.write,
+            tasks=tasks_from_iterable(messages),
+            **kw)
+        return fd.getvalue(), err.getvalue().count(u'Traceback')
+
+    def test_identical(self):
+        """
+        Rendering with a render plan produces exactly the same output, and
+        catches the same number of exceptions, as the general `format_node`
+        and `get_children` for a variety of options.
+        """
+        option_sets = [
+            {},
+            dict(human_readable=True),
+            dict(theme=colors, colorize_tree=True, human_readable=True),
+            dict(theme=colors, ascii=True, field_limit=5),
+            dict(ignored_fields={u'task_uuid', u'key'}),
+            dict(max_items=1, max_nesting=2),
+            dict(max_depth=1, max_children=1),
+            dict(collapse_repeated=True, theme=colors, colorize_tree=True),
+        ]
+        for kw in option_sets:
+            for messages in self.tasks:
+                self.assertThat(
+                    self.render(messages, **kw),
+                    Equals(self.render(
+                        messages, format_node=format_node, **kw)),
+                    repr(kw))
+
+    def test_nodes(self):
+        """
+        The specialized `format_node` and `get_children` of a render plan
+        agree with the general versions for every node in a tree.
+        """
+        theme = get_theme(dark_background=True)
+        format_value = _default_value_formatter(
+            human_readable=True, field_limit=0)
+        options = Options()
+        plan = render_plan(
+            format_value, theme, options, DEFAULT_IGNORED_KEYS)
+        stack = list(tasks_from_iterable(branching_task_messages))
+        while stack:
+            node = stack.pop()
+            self.assertThat(
+                plan.format_node(node),
+                Equals(format_node(format_value, theme, options, node)))
+            children = list(plan.get_children(node))
+            self.assertThat(
+                children,
+                Equals(list(get_children(DEFAULT_IGNORED_KEYS, node))))
+            stack.extend(children)
@@ -17,10 +17,12 @@
 from ._text import (
     format_ascii_tree,
     format_tree,
+    format_tree_lines,
     print_tree,
     Options,
     ASCII_OPTIONS,
 )
 
 __all__ = [
-    'format_ascii_tree', 'format_tree', 'print_tree', 'Options', 'ASCII_OPTIONS']
+    'format_ascii_tree', 'format_tree', 'format_tree_lines', 'print_tree',
+    'Options', 'ASCII_OPTIONS']
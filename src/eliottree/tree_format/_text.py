@@ -22,6 +22,11 @@ import itertools
 
 RIGHT_DOUBLE_ARROW = u'\N{RIGHTWARDS DOUBLE ARROW}'
 HOURGLASS = u'\N{WHITE HOURGLASS}'
+MULTIPLICATION_SIGN = u'\N{MULTIPLICATION SIGN}'
+
+#: Number of distinct colors whose tree drawing fragments are cached while
+#: formatting a tree.
+FRAGMENT_CACHE_SIZE = 64
 
 
 class Options(object):
@@ -32,7 +37,8 @@ class Options(object):
                  HORIZONTAL=u'\u2500',
                  NEWLINE=u'\u23ce',
                  ARROW=RIGHT_DOUBLE_ARROW,
-                 HOURGLASS=HOURGLASS):
+                 HOURGLASS=HOURGLASS,
+                 TIMES=MULTIPLICATION_SIGN):
         self.FORK = FORK
         self.LAST = LAST
         self.VERTICAL = VERTICAL
@@ -40,19 +46,26 @@ class Options(object):
         self.NEWLINE = NEWLINE
         self.ARROW = ARROW
         self.HOURGLASS = HOURGLASS
+        self.TIMES = TIMES
+        self._vertical = u''.join([VERTICAL, u'   '])
+        self._fork = u''.join([FORK, HORIZONTAL, HORIZONTAL, u' '])
+        self._last = u''.join([LAST, HORIZONTAL, HORIZONTAL, u' '])
 
     def color(self, node, depth):
-        return lambda text, *a, **kw: text
+        return _no_color
 
     def vertical(self):
-        return u''.join([self.VERTICAL, u'   '])
+        return self._vertical
 
     def fork(self):
-        return u''.join([self.FORK, self.HORIZONTAL, self.HORIZONTAL, u' '])
+        return self._fork
 
     def last(self):
-        return u''.join([self.LAST, self.HORIZONTAL, self.HORIZONTAL, u' '])
+        return self._last
+
 
+def _no_color(text, *a, **kw):
+    return text
 
 
 ASCII_OPTIONS = Options(FORK=u'|',
@@ -61,7 +74,8 @@ ASCII_OPTIONS = Options(FORK=u'|',
                         HORIZONTAL=u'-',
                         NEWLINE=u'\n',
                         ARROW=u'=>',
-                        HOURGLASS='|Y|')
+                        HOURGLASS='|Y|',
+                        TIMES=u'x')
 
 
 def _format_newlines(prefix, formatted_node, options):
@@ -70,6 +84,8 @@ def _format_newlines(prefix, formatted_node, options):
     then a tree prefix so as to position the remaining text under the previous
     line.
     """
+    if u'\n' not in formatted_node:
+        return formatted_node
     replacement = u''.join([
         options.NEWLINE,
         u'\n',
@@ -77,44 +93,89 @@ def _format_newlines(prefix, formatted_node, options):
     return formatted_node.replace(u'\n', replacement)
 
 
-def _format_tree(node, format_node, get_children, options, prefix=u'', depth=0):
+def _fragments(options, color, cache):
+    """
+    The vertical, fork and last tree drawing fragments for ``color``, created
+    once for each of the first `FRAGMENT_CACHE_SIZE` colors seen.
+
+    Colors beyond those, such as a new callable for every node, are not
+    cached so that the cache cannot grow with the size of the tree.
+    """
+    fragments = cache.get(color)
+    if fragments is None:
+        fragments = (
+            color(options.vertical()),
+            color(options.fork()),
+            color(options.last()))
+        if len(cache) < FRAGMENT_CACHE_SIZE:
+            cache[color] = fragments
+    return fragments
+
+
+def _tree_frame(node, get_children, options, prefix, depth, cache):
+    """
+    Create the traversal state for ``node``: its children, the index of the
+    next child to format, its prefix, fork and last fragments, the prefix for
+    its children and depth.
+    """
     children = list(get_children(node))
-    color = options.color(node, depth)
-    #options.set_depth(depth)
-    next_prefix = prefix + color(options.vertical())
-    for child in children[:-1]:
-        yield u''.join([prefix,
-                        color(options.fork()),
-                        _format_newlines(next_prefix,
-                                         format_node(child),
-                                         options)])
-        for result in _format_tree(child,
-                                   format_node,
-                                   get_children,
-                                   options,
-                                   next_prefix,
-                                   depth=depth + 1):
-            yield result
-    if children:
-        last_prefix = u''.join([prefix, u'    '])
-        yield u''.join([prefix,
-                        color(options.last()),
-                        _format_newlines(last_prefix,
-                                         format_node(children[-1]),
-                                         options)])
-        for result in _format_tree(children[-1],
-                                   format_node,
-                                   get_children,
-                                   options,
-                                   last_prefix,
-                                   depth=depth + 1):
-            yield result
+    vertical, fork, last = _fragments(
+        options, options.color(node, depth), cache)
+    return [children, 0, prefix, fork, last, prefix + vertical, depth]
 
 
-def format_tree(node, format_node, get_children, options=None):
-    lines = itertools.chain(
+def _format_tree(node, format_node, get_children, options, prefix=u'', depth=0):
+    """
+    Format the descendants of ``node`` as lines.
+
+    The tree is traversed with an explicit stack, rather than recursively, so
+    that arbitrarily deep trees can be formatted.
+    """
+    cache = {}
+    stack = [_tree_frame(node, get_children, options, prefix, depth, cache)]
+    while stack:
+        frame = stack[-1]
+        children, index, prefix, fork, last, next_prefix, depth = frame
+        if index >= len(children):
+            stack.pop()
+            continue
+        child = children[index]
+        if index < len(children) - 1:
+            frame[1] = index + 1
+            yield u''.join([prefix,
+                            fork,
+                            _format_newlines(next_prefix,
+                                             format_node(child),
+                                             options)])
+        else:
+            # Nothing remains to be formatted for this node, after its last
+            # child.
+            stack.pop()
+            next_prefix = prefix + u'    '
+            yield u''.join([prefix,
+                            last,
+                            _format_newlines(next_prefix,
+                                             format_node(child),
+                                             options)])
+        stack.append(_tree_frame(
+            child, get_children, options, next_prefix, depth + 1, cache))
+
+
+def format_tree_lines(node, format_node, get_children, options=None):
+    """
+    Format a tree as an iterable of lines, without line endings, produced as
+    the tree is traversed so that the whole rendered tree is never held in
+    memory.
+    """
+    return itertools.chain(
         [format_node(node)],
         _format_tree(node, format_node, get_children, options or Options()),
+    )
+
+
+def format_tree(node, format_node, get_children, options=None):
+    lines = itertools.chain(
+        format_tree_lines(node, format_node, get_children, options),
         [u''],
     )
     return u'\n'.join(lines)
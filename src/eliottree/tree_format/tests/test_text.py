@@ -15,6 +15,7 @@
 # limitations under the License.
 
 import doctest
+import sys
 from operator import itemgetter
 from textwrap import dedent
 
@@ -22,7 +23,8 @@ from testtools import TestCase
 from testtools.matchers import DocTestMatches
 
 from .._text import (
-    format_tree, format_ascii_tree,
+    FRAGMENT_CACHE_SIZE, Options, _fragments, format_tree, format_ascii_tree,
+    format_tree_lines,
 )
 
 
@@ -153,6 +155,74 @@ class TestFormatTree(TestCase):
         +-- qux
         '''), output)
 
+    def test_deep_tree(self):
+        depth = sys.getrecursionlimit() * 2
+        tree = ('leaf', [])
+        for i in range(depth):
+            tree = ('node', [tree])
+        lines = list(format_tree_lines(tree, itemgetter(0), itemgetter(1)))
+        self.assertEqual(len(lines), depth + 1)
+        self.assertEqual(
+            lines[-1],
+            u'    ' * (depth - 1) + u'\u2514\u2500\u2500 leaf')
+
+    def test_colored_fragments(self):
+        calls = []
+
+        def red(text):
+            calls.append(text)
+            return u'<{}>'.format(text)
+
+        class RedOptions(Options):
+            def color(self, node, depth):
+                return red
+
+        tree = ('foo', [('bar', [('a', []), ('b', [])]), ('baz', [])])
+        self.assertEqual(
+            format_tree(tree, itemgetter(0), itemgetter(1), RedOptions()),
+            dedent(u'''\
+            foo
+            <\u251c\u2500\u2500 >bar
+            <\u2502   ><\u251c\u2500\u2500 >a
+            <\u2502   ><\u2514\u2500\u2500 >b
+            <\u2514\u2500\u2500 >baz
+            '''))
+        self.assertEqual(len(calls), 3)
+
+    def test_fragment_cache_bounded(self):
+        options = Options()
+        cache = {}
+        for i in range(FRAGMENT_CACHE_SIZE * 2):
+            def color(text, i=i):
+                return u'{}{}'.format(i, text)
+            self.assertEqual(
+                _fragments(options, color, cache),
+                (color(options.vertical()),
+                 color(options.fork()),
+                 color(options.last())))
+        self.assertEqual(len(cache), FRAGMENT_CACHE_SIZE)
+
+    def test_lines(self):
+        tree = (
+            'foo', [
+                ('bar\nfrob', [
+                    ('a', []),
+                ]),
+                ('baz', []),
+            ],
+        )
+        lines = format_tree_lines(tree, itemgetter(0), itemgetter(1))
+        self.assertEqual(next(lines), u'foo')
+        self.assertEqual(list(lines), [
+            u'\u251c\u2500\u2500 bar\u23ce\n\u2502   frob',
+            u'\u2502   \u2514\u2500\u2500 a',
+            u'\u2514\u2500\u2500 baz'])
+        self.assertEqual(
+            u'\n'.join(
+                list(format_tree_lines(tree, itemgetter(0), itemgetter(1)))
+                + [u'']),
+            self.format_tree(tree))
+
 
 def d(name, files):
     return (name, files)